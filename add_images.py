@@ -1,13 +1,33 @@
-owner@pizzar@ging but when i click disptached  i click prepapring ns no#!/usr/bin/env python3
+#!/usr/bin/env python3
 """
 Script to automatically add sample images for food items
+
+Every distinct source URL is downloaded once, with bounded concurrency, into
+a local cache keyed by a hash of the URL, so reruns don't download anything
+again. Each download is then decoded and resized once, in a process pool,
+into a single upload that every menu item mapped to that URL shares.
+
+Usage:
+    python add_images.py                                 # items without an image
+    python add_images.py --workers 16 --processes 4
+    python add_images.py --mirror http://127.0.0.1:8000  # fetch from a local stand-in
 """
 
+import argparse
+import hashlib
+import multiprocessing
 import os
-import requests
-from app import app, db, MenuItem
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from urllib.parse import urlsplit, urlunsplit
+
 from PIL import Image
-import io
+
+from image_fetch import ImageFetchError, download
+
+IMAGE_SIZE = (400, 300)
+DEFAULT_CACHE_DIR = os.path.join('instance', 'image_cache')
 
 # Sample food images from Unsplash (free stock photos)
 FOOD_IMAGES = {
@@ -44,73 +64,163 @@ FOOD_IMAGES = {
     ]
 }
 
-def download_image(url, filename):
-    """Download image from URL and save to uploads folder"""
-    try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        
-        # Open and resize image
-        img = Image.open(io.BytesIO(response.content))
-        img = img.resize((400, 300), Image.Resampling.LANCZOS)
-        
-        # Save image
-        file_path = os.path.join('static', 'uploads', filename)
-        img.save(file_path, 'JPEG', quality=85)
-        
-        return f"uploads/{filename}"
-    except Exception as e:
-        print(f"Error downloading {url}: {e}")
-        return None
-
-def add_images_to_menu_items():
+
+def category_type_for(name):
+    """Pick the FOOD_IMAGES list for a menu item name"""
+    name = name.lower()
+    if 'pasta' in name or 'spaghetti' in name or 'fettuccine' in name:
+        return 'pasta'
+    if 'salad' in name:
+        return 'salad'
+    if 'drink' in name or 'lemonade' in name or 'tea' in name:
+        return 'beverage'
+    if 'cake' in name or 'tiramisu' in name or 'cheesecake' in name:
+        return 'dessert'
+    return 'pizza'
+
+
+def url_key(url):
+    return hashlib.sha256(url.encode()).hexdigest()
+
+
+def mirrored(url, mirror):
+    """Point url at the mirror's scheme and host, keeping its path and query"""
+    if not mirror:
+        return url
+    base = urlsplit(mirror)
+    parts = urlsplit(url)
+    return urlunsplit((base.scheme, base.netloc, base.path.rstrip('/') + parts.path, parts.query, ''))
+
+
+def fetch_to_cache(url, cache_dir, mirror=None, timeout=10):
+    """Return (cache path, cache hit) for url, downloading it on a miss"""
+    path = os.path.join(cache_dir, url_key(url))
+    if os.path.exists(path):
+        return path, True
+    body, _ = download(mirrored(url, mirror), timeout=timeout, allow_private=True)
+    # Write then rename, so an interrupted run never leaves a partial cache entry
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(body)
+    os.replace(temp_path, path)
+    return path, False
+
+
+def resize_image(source, destination, size=IMAGE_SIZE):
+    """Decode a cached download and save it resized as JPEG (runs in a worker process)"""
+    with Image.open(source) as img:
+        img.draft('RGB', size)
+        img = img.convert('RGB').resize(size, Image.Resampling.LANCZOS)
+        img.save(destination, 'JPEG', quality=85)
+    return destination
+
+
+def plan_images(menu_items):
+    """Map each item without an image to a source URL, as {url: [(item id, name), ...]}"""
+    plan = {}
+    for i, item in enumerate(menu_items):
+        if item.image:
+            continue
+        image_urls = FOOD_IMAGES[category_type_for(item.name)]
+        plan.setdefault(image_urls[i % len(image_urls)], []).append((item.id, item.name))
+    return plan
+
+
+def build_images(urls, upload_folder, cache_dir, workers=8, processes=None, mirror=None, timeout=10):
+    """Download and resize every URL; returns ({url: upload path}, {url: error})
+
+    Downloads run on a thread pool; each finished download is handed straight
+    to the process pool for resizing, so decoding overlaps the remaining
+    downloads. The resize workers are spawned rather than forked, since the
+    download threads are already running when the pool starts.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    os.makedirs(upload_folder, exist_ok=True)
+    paths, failures = {}, {}
+    total = len(urls)
+    done = cached = 0
+
+    def report(mark, url, detail):
+        print(f"[{done:>{len(str(total))}}/{total}] {mark} {detail} <- {url}")
+
+    with ThreadPoolExecutor(max_workers=workers) as fetchers, \
+            ProcessPoolExecutor(max_workers=processes,
+                                mp_context=multiprocessing.get_context('spawn')) as resizers:
+        downloads = {fetchers.submit(fetch_to_cache, url, cache_dir, mirror, timeout): url for url in urls}
+        resizes = {}
+        for future in as_completed(downloads):
+            url = downloads[future]
+            try:
+                cache_path, hit = future.result()
+            except ImageFetchError as e:
+                done += 1
+                failures[url] = str(e)
+                report('✗', url, str(e))
+                continue
+            cached += hit
+            filename = f"sample_{url_key(url)[:16]}.jpg"
+            resizes[resizers.submit(resize_image, cache_path,
+                                    os.path.join(upload_folder, filename))] = (url, filename, hit)
+
+        for future in as_completed(resizes):
+            url, filename, hit = resizes[future]
+            done += 1
+            try:
+                future.result()
+            except Exception as e:
+                failures[url] = f"resize failed: {e}"
+                report('✗', url, f"resize failed: {e}")
+                continue
+            paths[url] = f"uploads/{filename}"
+            report('✓', url, f"{filename}{' (cached)' if hit else ''}")
+
+    print(f"{len(paths)} of {total} images ready, {cached} from the download cache, {len(failures)} failed")
+    return paths, failures
+
+
+def add_images_to_menu_items(workers=8, processes=None, cache_dir=DEFAULT_CACHE_DIR, mirror=None, timeout=10):
     """Add sample images to menu items"""
+    from app import app, db, image_pipeline, MenuItem
+
     with app.app_context():
-        # Get all menu items
-        menu_items = MenuItem.query.all()
-        
-        print(f"Found {len(menu_items)} menu items")
-        
-        for i, item in enumerate(menu_items):
-            # Skip if item already has an image
-            if item.image:
-                print(f"Skipping {item.name} - already has image: {item.image}")
-                continue
-                
-            # Determine category type
-            category_type = 'pizza'  # default
-            if 'pasta' in item.name.lower() or 'spaghetti' in item.name.lower() or 'fettuccine' in item.name.lower():
-                category_type = 'pasta'
-            elif 'salad' in item.name.lower():
-                category_type = 'salad'
-            elif 'drink' in item.name.lower() or 'lemonade' in item.name.lower() or 'tea' in item.name.lower():
-                category_type = 'beverage'
-            elif 'cake' in item.name.lower() or 'tiramisu' in item.name.lower() or 'cheesecake' in item.name.lower():
-                category_type = 'dessert'
-            elif 'pizza' in item.name.lower():
-                category_type = 'pizza'
-            
-            # Get image URL
-            image_urls = FOOD_IMAGES.get(category_type, FOOD_IMAGES['pizza'])
-            image_url = image_urls[i % len(image_urls)]
-            
-            # Generate filename
-            filename = f"{category_type}_{i+1}.jpg"
-            
-            # Download and save image
-            image_path = download_image(image_url, filename)
-            
-            if image_path:
-                # Update menu item with image path
-                item.image = image_path
-                print(f"Added image to {item.name}: {image_path}")
-            else:
-                print(f"Failed to add image to {item.name}")
-        
-        # Commit changes
+        menu_items = MenuItem.query.order_by(MenuItem.id).all()
+        plan = plan_images(menu_items)
+        print(f"Found {len(menu_items)} menu items, {sum(map(len, plan.values()))} without an image "
+              f"using {len(plan)} distinct images")
+        if not plan:
+            return True
+
+        start = time.perf_counter()
+        paths, failures = build_images(list(plan), app.config['UPLOAD_FOLDER'], cache_dir,
+                                       workers=workers, processes=processes, mirror=mirror, timeout=timeout)
+
+        items = {item.id: item for item in menu_items}
+        for url, path in paths.items():
+            for item_id, _ in plan[url]:
+                items[item_id].image = path
         db.session.commit()
-        print("All images have been added to menu items!")
+
+        updated = sum(len(plan[url]) for url in paths)
+        print(f"Added images to {updated} menu items in {time.perf_counter() - start:.1f}s")
+        for url, error in failures.items():
+            names = ', '.join(name for _, name in plan[url])
+            print(f"✗ {names}: {error}")
+        if updated:
+            # Committing the new images queued their responsive variants
+            print("Generating responsive image variants...")
+            image_pipeline.shutdown(wait=True)
+        return not failures
+
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Add sample images to menu items without one.')
+    parser.add_argument('--workers', type=int, default=8, help='concurrent downloads')
+    parser.add_argument('--processes', type=int, default=None, help='resize processes (default: CPU count)')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help='download cache directory')
+    parser.add_argument('--mirror', help='fetch from this base URL instead of the original hosts')
+    parser.add_argument('--timeout', type=int, default=10, help='download timeout in seconds')
+    args = parser.parse_args()
+
     print("Adding sample images to menu items...")
-    add_images_to_menu_items() 
\ No newline at end of file
+    ok = add_images_to_menu_items(args.workers, args.processes, args.cache_dir, args.mirror, args.timeout)
+    sys.exit(0 if ok else 1)
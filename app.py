@@ -1,23 +1,55 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, make_response, Response, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, inspect, select, update, insert, func, or_, tuple_
+from sqlalchemy.orm import contains_eager, joinedload, make_transient_to_detached, selectinload
+from sqlalchemy.exc import IntegrityError
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
-from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
 import os
-import bcrypt
 from datetime import datetime
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from config import Config
+from config import config_by_name
+from db_profile import apply_sqlite_pragmas
+from email_outbox import OutboxWorkerPool
+from order_events import EventBroker, TooManySubscribers, sse_stream
+from pagination import keyset_page
+from menu_cache import MenuCatalogCache
+from menu_index import MenuIndex, snapshot_item
+from image_variants import ImageVariantPipeline
+from image_fetch import ImageFetcher, is_remote
+from menu_import import FORMATS, RowError, detect_format, export_chunk, read_rows, validate_row
+from static_assets import StaticAssets
+from passwords import PasswordHasher, PasswordHasherBusy
+from identity_cache import IdentityCache
+from cart_store import create_cart_store
+from metrics import RequestMetrics
+from order_status import ORDER_TRANSITIONS, TERMINAL_STATUSES, InvalidTransition, check_transition, source_statuses
+from structured_logging import StructuredLogging, log_event
+import click
+import logging
+import time
 import uuid
 
 app = Flask(__name__)
-app.config.from_object(Config)
+app.config.from_object(config_by_name[os.environ.get('APP_ENV', 'development')])
 
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
+structured_logging = StructuredLogging(level=app.config['LOG_LEVEL'],
+                                       log_file=app.config['LOG_FILE'],
+                                       sample_rates=app.config['LOG_SAMPLE_RATES'],
+                                       queue_size=app.config['LOG_QUEUE_SIZE'],
+                                       slow_log_file=app.config['SLOW_LOG_FILE'])
+logger = logging.getLogger('app')
+
 db = SQLAlchemy(app)
+request_metrics = RequestMetrics(app, slow_request_ms=app.config['SLOW_REQUEST_MS'],
+                                 slow_query_ms=app.config['SLOW_QUERY_MS'],
+                                 token=app.config['METRICS_TOKEN'])
+request_metrics.add_callback('log_records_dropped_total', 'Log records dropped because the log queue was full.',
+                             'counter', lambda: structured_logging.dropped)
+with app.app_context():
+    apply_sqlite_pragmas(db.engine, app.config['SQLITE_PRAGMAS'])
+    request_metrics.instrument_engine(db.engine)
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'login'
@@ -41,12 +73,14 @@ class Restaurant(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     categories = db.relationship('Category', backref='restaurant', lazy=True)
     menu_items = db.relationship('MenuItem', backref='restaurant', lazy=True)
+    __table_args__ = (db.Index('ix_restaurant_user_id', 'user_id'),)
 
 class Category(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(50), nullable=False)
     restaurant_id = db.Column(db.Integer, db.ForeignKey('restaurant.id'), nullable=False)
     menu_items = db.relationship('MenuItem', backref='category', lazy=True)
+    __table_args__ = (db.Index('ix_category_restaurant_id', 'restaurant_id'),)
 
 class MenuItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -54,22 +88,41 @@ class MenuItem(db.Model):
     description = db.Column(db.Text, nullable=False)
     price = db.Column(db.Float, nullable=False)
     image = db.Column(db.String(255))
+    # {'jpeg': {'320': 'uploads/variants/...', ...}, 'webp': {...}}; filled in by image_pipeline,
+    # cleared whenever image changes
+    image_variants = db.Column(db.JSON)
     is_available = db.Column(db.Boolean, default=True)
     is_vegetarian = db.Column(db.Boolean, default=False)
     category_id = db.Column(db.Integer, db.ForeignKey('category.id'), nullable=False)
     restaurant_id = db.Column(db.Integer, db.ForeignKey('restaurant.id'), nullable=False)
     order_items = db.relationship('OrderItem', backref='menu_item', lazy=True)
+    __table_args__ = (
+        db.Index('ix_menu_item_restaurant_id', 'restaurant_id'),
+        db.Index('ix_menu_item_category_id', 'category_id'),
+        db.Index('ix_menu_item_is_available', 'is_available'),
+    )
 
 class Order(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     restaurant_id = db.Column(db.Integer, db.ForeignKey('restaurant.id'), nullable=False)
     total_amount = db.Column(db.Float, nullable=False)
-    status = db.Column(db.String(20), default='pending')  # pending, confirmed, preparing, dispatched, delivered
+    status = db.Column(db.String(20), default='pending')  # see order_status.ORDER_TRANSITIONS
     delivery_address = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Bumped on every change; updates that carry a stale version are rejected
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
     order_items = db.relationship('OrderItem', backref='order', lazy=True)
     restaurant = db.relationship('Restaurant', backref='orders', lazy=True)
+    # Composite indexes match the feeds: filter by owner/status, newest first
+    __table_args__ = (
+        db.Index('ix_order_user_id_created_at', 'user_id', 'created_at'),
+        db.Index('ix_order_restaurant_id_created_at', 'restaurant_id', 'created_at'),
+        db.Index('ix_order_restaurant_id_status_created_at', 'restaurant_id', 'status', 'created_at'),
+        db.Index('ix_order_status_created_at', 'status', 'created_at'),
+        db.Index('ix_order_created_at', 'created_at'),
+    )
+    __mapper_args__ = {'version_id_col': version}
 
 class OrderItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -77,10 +130,169 @@ class OrderItem(db.Model):
     menu_item_id = db.Column(db.Integer, db.ForeignKey('menu_item.id'), nullable=False)
     quantity = db.Column(db.Integer, nullable=False)
     price = db.Column(db.Float, nullable=False)
+    __table_args__ = (
+        db.Index('ix_order_item_order_id', 'order_id'),
+        db.Index('ix_order_item_menu_item_id', 'menu_item_id'),
+    )
+
+class CheckoutRequest(db.Model):
+    # Idempotency key submitted with the checkout form, mapped to the order it created
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    idempotency_key = db.Column(db.String(64), nullable=False)
+    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    order = db.relationship('Order', lazy=True)
+    __table_args__ = (db.UniqueConstraint('user_id', 'idempotency_key'),)
+
+class EmailOutbox(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    to_email = db.Column(db.String(120), nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), default='pending')  # pending, sending, sent, dead
+    attempts = db.Column(db.Integer, default=0)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow)
+    claimed_at = db.Column(db.DateTime)
+    claim_token = db.Column(db.String(32))
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+    __table_args__ = (
+        db.Index('ix_email_outbox_status_next_attempt_at', 'status', 'next_attempt_at'),
+        db.Index('ix_email_outbox_claim_token', 'claim_token'),
+    )
+
+class MenuVersion(db.Model):
+    # Single-row table; bumped whenever a Category or MenuItem is written
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=1)
+
+menu_catalog_cache = MenuCatalogCache()
+menu_index = MenuIndex()
+
+MENU_PAGE_SIZE = 24
+MENU_MAX_PAGE_SIZE = 100
+
+def bump_menu_version(connection):
+    """Increment the persisted menu version on the given connection and return it"""
+    result = connection.execute(
+        update(MenuVersion).where(MenuVersion.id == 1)
+        .values(version=MenuVersion.version + 1))
+    if result.rowcount == 0:
+        connection.execute(insert(MenuVersion).values(id=1, version=2))
+        return 2
+    return connection.execute(
+        select(MenuVersion.version).where(MenuVersion.id == 1)).scalar()
+
+def current_menu_version():
+    """Return the persisted menu version (1 before the first menu write)"""
+    version = db.session.execute(
+        select(MenuVersion.version).where(MenuVersion.id == 1)).scalar()
+    return version or 1
+
+@event.listens_for(db.session, 'after_flush')
+def _record_menu_writes(session, flush_context):
+    """Bump the menu version and remember item changes when the menu is written"""
+    written = list(session.new) + [obj for obj in session.dirty if session.is_modified(obj)]
+    deleted = list(session.deleted)
+    if not any(isinstance(obj, (Category, MenuItem)) for obj in written + deleted):
+        return
+    
+    new_version = bump_menu_version(session.connection())
+    pending = session.info.setdefault('menu_changes', {
+        'from_version': new_version - 1, 'upserts': {}, 'removals': set()})
+    pending['to_version'] = new_version
+    
+    for obj in written:
+        if isinstance(obj, MenuItem):
+            pending['upserts'][obj.id] = snapshot_item(obj)
+            pending['removals'].discard(obj.id)
+    for obj in deleted:
+        if isinstance(obj, MenuItem):
+            pending['upserts'].pop(obj.id, None)
+            pending['removals'].add(obj.id)
+
+@event.listens_for(db.session, 'after_commit')
+def _apply_menu_writes(session):
+    """Update the in-memory menu index incrementally once the write is durable"""
+    pending = session.info.pop('menu_changes', None)
+    if pending:
+        menu_index.apply(pending['from_version'], pending['to_version'],
+                         list(pending['upserts'].values()), pending['removals'])
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_menu_writes(session):
+    session.info.pop('menu_changes', None)
+
+def menu_item_popularity():
+    """{menu_item_id: number of orders that included it}, from the order_item index alone"""
+    return dict(db.session.execute(
+        select(OrderItem.menu_item_id, func.count()).group_by(OrderItem.menu_item_id)).all())
+
+def ensure_menu_index(version):
+    """Rebuild the menu index if another process moved the menu version"""
+    if menu_index.version != version:
+        items = MenuItem.query.filter_by(is_available=True).all()
+        menu_index.rebuild(version, [snapshot_item(item) for item in items], menu_item_popularity())
+
+def load_menu_catalog(version):
+    """Load categories and the first menu page as dicts that are safe to share between requests"""
+    ensure_menu_index(version)
+    categories = [{'id': c.id, 'name': c.name} for c in Category.query.all()]
+    items, next_cursor = menu_index.query(limit=MENU_PAGE_SIZE)
+    return {'categories': categories, 'items': items, 'next_cursor': next_cursor}
+
+def menu_etag(version):
+    """ETag for the menu page; the navbar and cart forms depend on the viewer"""
+    if current_user.is_authenticated:
+        viewer = f"u{current_user.id}"
+    else:
+        viewer = "anon"
+    return f"menu-v{version}-{viewer}"
+
+password_hasher = PasswordHasher(
+    scheme=app.config['PASSWORD_SCHEME'],
+    params=app.config['PASSWORD_SCHEME_PARAMS'].get(app.config['PASSWORD_SCHEME']),
+    workers=app.config['PASSWORD_HASH_WORKERS'],
+    max_pending=app.config['PASSWORD_HASH_QUEUE'],
+    executor=app.config['PASSWORD_HASH_EXECUTOR'])
+
+# Column values of recently loaded users, keyed by id
+user_cache = IdentityCache(maxsize=app.config['USER_CACHE_SIZE'], ttl=app.config['USER_CACHE_TTL'])
+USER_CACHE_COLUMNS = [column.key for column in User.__table__.columns]
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    user_id = int(user_id)
+    values = user_cache.get(user_id)
+    if values is None:
+        user = db.session.get(User, user_id)
+        if user is not None:
+            user_cache.set(user_id, {key: getattr(user, key) for key in USER_CACHE_COLUMNS})
+        return user
+    
+    # Rebuild the row as a persistent instance of this session without a query
+    user = User(**values)
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
+
+@event.listens_for(db.session, 'after_flush')
+def _record_user_writes(session, flush_context):
+    changed = [obj.id for obj in list(session.dirty) + list(session.deleted)
+               if isinstance(obj, User)]
+    if changed:
+        session.info.setdefault('user_changes', set()).update(changed)
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidate_user_cache(session):
+    changed = session.info.pop('user_changes', None)
+    if changed:
+        user_cache.invalidate(*changed)
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_user_writes(session):
+    session.info.pop('user_changes', None)
 
 def allowed_file(filename):
     """Check if file extension is allowed"""
@@ -103,31 +315,186 @@ def save_image(file):
         return f"uploads/{unique_filename}"
     return None
 
-def send_email(to_email, subject, body):
-    """Send email notification"""
+# Fingerprinted /assets/ copies of static/css and static/js, linked with asset_url()
+static_assets = StaticAssets(app)
+
+image_pipeline = ImageVariantPipeline(app.static_folder, max_workers=app.config['IMAGE_VARIANT_WORKERS'])
+
+def record_image_variants(item_id, image, future):
+    """Store finished variants on the menu item (runs on the pipeline's callback thread)"""
     try:
-        # Check if email configuration is available
-        if not app.config.get('MAIL_USERNAME') or not app.config.get('MAIL_PASSWORD'):
-            print("Email configuration not set up. Skipping email send.")
-            return False
-            
-        msg = MIMEMultipart()
-        msg['From'] = app.config['MAIL_USERNAME']
-        msg['To'] = to_email
-        msg['Subject'] = subject
-        
-        msg.attach(MIMEText(body, 'plain'))
-        
-        server = smtplib.SMTP(app.config['MAIL_SERVER'], app.config['MAIL_PORT'])
-        server.starttls()
-        server.login(app.config['MAIL_USERNAME'], app.config['MAIL_PASSWORD'])
-        text = msg.as_string()
-        server.sendmail(app.config['MAIL_USERNAME'], to_email, text)
-        server.quit()
-        return True
-    except Exception as e:
-        print(f"Email error: {e}")
+        variants = future.result()
+    except Exception:
+        logger.exception("Failed to generate image variants for %s", image,
+                         extra={'event': 'image.variants_failed', 'menu_item_id': item_id, 'image': image})
+        return
+    
+    with app.app_context():
+        menu_item = db.session.get(MenuItem, item_id)
+        # Skip items deleted or given a new image in the meantime
+        if menu_item and menu_item.image == image:
+            menu_item.image_variants = variants
+            db.session.commit()
+
+def queue_image_variants(image, item_ids):
+    """Generate resized variants of one image for the menu items using it, in the background"""
+    image_pipeline.submit(image, lambda future: [record_image_variants(item_id, image, future)
+                                                 for item_id in item_ids])
+
+@event.listens_for(MenuItem.image, 'set')
+def _clear_image_variants(menu_item, value, oldvalue, initiator):
+    # The variants belong to the old picture; new ones are queued after commit
+    if value != oldvalue:
+        menu_item.image_variants = None
+
+@event.listens_for(db.session, 'after_flush')
+def _record_image_changes(session, flush_context):
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, MenuItem) and inspect(obj).attrs.image.history.has_changes():
+            session.info.setdefault('image_changes', {})[obj.id] = obj.image
+
+@event.listens_for(db.session, 'after_commit')
+def _queue_changed_images(session):
+    images = {}
+    for item_id, image in session.info.pop('image_changes', {}).items():
+        if image:
+            images.setdefault(image, []).append(item_id)
+    for image, item_ids in images.items():
+        queue_image_variants(image, item_ids)
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_image_changes(session):
+    session.info.pop('image_changes', None)
+
+@app.template_global()
+def image_srcset(variants, image_format):
+    """srcset value for one format of a MenuItem.image_variants dict"""
+    paths = (variants or {}).get(image_format) or {}
+    return ', '.join(f"{url_for('static', filename=path)} {width}w"
+                     for width, path in sorted(paths.items(), key=lambda entry: int(entry[0])))
+
+outbox_workers = OutboxWorkerPool(
+    app, db, EmailOutbox,
+    workers=app.config['OUTBOX_WORKERS'],
+    batch_size=app.config['OUTBOX_BATCH_SIZE'],
+    max_attempts=app.config['OUTBOX_MAX_ATTEMPTS'],
+    backoff_base=app.config['OUTBOX_BACKOFF_SECONDS'],
+    poll_interval=app.config['OUTBOX_POLL_INTERVAL'])
+
+def email_configured():
+    return bool(app.config.get('MAIL_USERNAME') and app.config.get('MAIL_PASSWORD'))
+
+
+@app.cli.command('outbox-worker')
+@click.option('--once', is_flag=True, help='Send everything that is due, then exit.')
+def outbox_worker_command(once):
+    """Deliver queued emails until interrupted."""
+    if not email_configured():
+        raise click.ClickException('MAIL_USERNAME and MAIL_PASSWORD are not set.')
+    if once:
+        click.echo(f"Sent {outbox_workers.drain()} emails")
+        return
+    outbox_workers.start()
+    click.echo(f"Outbox worker running with {outbox_workers.workers} threads (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        outbox_workers.stop()
+
+def queue_email(to_email, subject, body):
+    """Add an email notification to the outbox in the current transaction"""
+    if not email_configured():
+        log_event(logger, 'email.skipped', message="Email configuration not set up. Skipping email send.",
+                  subject=subject)
         return False
+    
+    db.session.add(EmailOutbox(to_email=to_email, subject=subject, body=body))
+    db.session.info['outbox_pending'] = True
+    return True
+
+@event.listens_for(db.session, 'after_commit')
+def _wake_outbox_workers(session):
+    if session.info.pop('outbox_pending', False):
+        outbox_workers.wake()
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_outbox_wakeup(session):
+    session.info.pop('outbox_pending', None)
+
+order_events = EventBroker(max_subscribers=app.config['SSE_MAX_STREAMS'])
+
+def queue_order_event(order):
+    """Publish the order to its customer, restaurant and admin channels after commit"""
+    db.session.info.setdefault('order_events', []).append({
+        'type': 'order',
+        'data': {
+            'id': order.id,
+            'user_id': order.user_id,
+            'restaurant_id': order.restaurant_id,
+            'status': order.status,
+            'version': order.version,
+            'total_amount': order.total_amount,
+            'created_at': order.created_at.isoformat() if order.created_at else None
+        }
+    })
+
+@event.listens_for(db.session, 'after_commit')
+def _publish_order_events(session):
+    for order_event in session.info.pop('order_events', []):
+        data = order_event['data']
+        order_events.publish(f"user:{data['user_id']}", order_event)
+        order_events.publish(f"restaurant:{data['restaurant_id']}", order_event)
+        order_events.publish('admin', order_event)
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_order_events(session):
+    session.info.pop('order_events', None)
+
+os.makedirs(app.instance_path, exist_ok=True)
+cart_store = create_cart_store(
+    app.config['CART_STORE'],
+    path=app.config['CART_DB_PATH'] or os.path.join(app.instance_path, 'carts.db'),
+    ttl=app.config['CART_TTL_SECONDS'])
+
+@app.before_request
+def _start_background_workers():
+    # Per process and on first use, so it works under any WSGI server; both
+    # are no-ops once running
+    cart_store.start_expiry(app.config['CART_PURGE_INTERVAL'])
+    if app.config['OUTBOX_AUTOSTART'] and email_configured():
+        outbox_workers.start()
+
+def price_cart(cart):
+    """Resolve a cart with a single IN query and return priced lines and totals"""
+    quantities = {}
+    for item_id, quantity in (cart or {}).items():
+        try:
+            quantities[int(item_id)] = quantity
+        except (TypeError, ValueError):
+            continue
+    
+    priced = {'items': [], 'total': 0, 'restaurant_id': None}
+    if not quantities:
+        return priced
+    
+    menu_items = {item.id: item for item in
+                  MenuItem.query.filter(MenuItem.id.in_(quantities)).all()}
+    
+    for item_id, quantity in quantities.items():
+        item = menu_items.get(item_id)
+        if item:
+            priced['items'].append({
+                'item': item,
+                'quantity': quantity,
+                'subtotal': item.price * quantity
+            })
+            priced['total'] += item.price * quantity
+            priced['restaurant_id'] = item.restaurant_id
+    
+    return priced
 
 # Routes
 @app.route('/')
@@ -148,7 +515,12 @@ def register():
             flash('Email already registered!', 'error')
             return redirect(url_for('register'))
         
-        password_hash = generate_password_hash(password)
+        try:
+            password_hash = password_hasher.hash(password)
+        except PasswordHasherBusy:
+            flash('The server is busy, please try again in a moment.', 'error')
+            return render_template('register.html'), 503
+        
         user = User(name=name, email=email, phone=phone, address=address, 
                    password_hash=password_hash, user_type=user_type)
         
@@ -186,7 +558,20 @@ def login():
         
         user = User.query.filter_by(email=email).first()
         
-        if user and check_password_hash(user.password_hash, password):
+        try:
+            valid = password_hasher.verify(password, user.password_hash if user else None)
+        except PasswordHasherBusy:
+            flash('The server is busy, please try again in a moment.', 'error')
+            return render_template('login.html'), 503
+        
+        if valid:
+            if password_hasher.needs_rehash(user.password_hash):
+                try:
+                    user.password_hash = password_hasher.hash(password)
+                    db.session.commit()
+                except PasswordHasherBusy:
+                    pass  # Upgrade the hash on a later login instead
+            
             login_user(user)
             flash('Login successful!', 'success')
             
@@ -210,156 +595,347 @@ def logout():
 
 @app.route('/menu')
 def menu():
-    categories = Category.query.all()
-    items = MenuItem.query.filter_by(is_available=True).all()
-    return render_template('menu.html', categories=categories, items=items)
+    version = current_menu_version()
+    etag = menu_etag(version)
+    
+    # Pending flash messages are rendered into the page, so they must not be
+    # swallowed by a 304
+    if '_flashes' not in session and etag in request.if_none_match:
+        response = make_response('', 304)
+    else:
+        catalog = menu_catalog_cache.get(version, lambda: load_menu_catalog(version))
+        response = make_response(render_template('menu.html',
+                                                  categories=catalog['categories'],
+                                                  items=catalog['items'],
+                                                  next_cursor=catalog['next_cursor']))
+    
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Cookie')
+    return response
 
-@app.route('/add_to_cart', methods=['POST'])
+@app.route('/menu/items')
+def menu_items():
+    """One page of the filtered, sorted menu, served from the in-memory index"""
+    try:
+        categories = {int(c) for c in request.args.getlist('category')} or None
+        vegetarian = request.args.get('vegetarian')
+        if vegetarian is not None:
+            if vegetarian not in ('true', 'false'):
+                raise ValueError('vegetarian must be true or false')
+            vegetarian = vegetarian == 'true'
+        min_price = request.args.get('min_price', type=float)
+        max_price = request.args.get('max_price', type=float)
+        limit = min(max(request.args.get('limit', MENU_PAGE_SIZE, type=int), 1), MENU_MAX_PAGE_SIZE)
+        
+        ensure_menu_index(current_menu_version())
+        items, next_cursor = menu_index.query(
+            categories=categories, vegetarian=vegetarian,
+            min_price=min_price, max_price=max_price,
+            search=request.args.get('q'), sort=request.args.get('sort', 'name'),
+            cursor=request.args.get('cursor'), limit=limit)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({'items': items, 'next_cursor': next_cursor})
+
+@app.route('/menu/cache_stats')
 @login_required
-def add_to_cart():
-    item_id = request.form.get('item_id')
-    quantity = int(request.form.get('quantity', 1))
+def menu_cache_stats():
+    if current_user.user_type != 'admin':
+        return jsonify({'error': 'Access denied'}), 403
     
-    if 'cart' not in session:
-        session['cart'] = {}
+    return jsonify(menu_catalog_cache.stats())
+
+@app.route('/users/cache_stats')
+@login_required
+def user_cache_stats():
+    if current_user.user_type != 'admin':
+        return jsonify({'error': 'Access denied'}), 403
     
-    if item_id in session['cart']:
-        session['cart'][item_id] += quantity
-    else:
-        session['cart'][item_id] = quantity
+    return jsonify(user_cache.stats())
+
+@app.route('/add_to_cart', methods=['POST'])
+@login_required
+def add_to_cart():
+    item_id = request.form.get('item_id', type=int)
+    quantity = request.form.get('quantity', 1, type=int)
+    if item_id is None:
+        flash('Invalid menu item!', 'error')
+        return redirect(url_for('menu'))
     
-    session.modified = True
+    cart_store.add(current_user.id, item_id, quantity)
     flash('Item added to cart!', 'success')
     return redirect(url_for('menu'))
 
 @app.route('/cart')
 @login_required
 def cart():
-    if 'cart' not in session or not session['cart']:
+    cart_items = cart_store.get(current_user.id)
+    if not cart_items:
         return render_template('cart.html', items=[], total=0)
     
-    cart_items = []
-    total = 0
-    
-    for item_id, quantity in session['cart'].items():
-        item = MenuItem.query.get(item_id)
-        if item:
-            cart_items.append({
-                'item': item,
-                'quantity': quantity,
-                'subtotal': item.price * quantity
-            })
-            total += item.price * quantity
-    
-    return render_template('cart.html', items=cart_items, total=total)
+    priced = price_cart(cart_items)
+    return render_template('cart.html', items=priced['items'], total=priced['total'])
 
 @app.route('/update_cart', methods=['POST'])
 @login_required
 def update_cart():
-    item_id = request.form.get('item_id')
-    quantity = int(request.form.get('quantity', 0))
+    item_id = request.form.get('item_id', type=int)
+    quantity = request.form.get('quantity', 0, type=int)
+    if item_id is None:
+        flash('Invalid menu item!', 'error')
+        return redirect(url_for('cart'))
     
-    if quantity <= 0:
-        session['cart'].pop(item_id, None)
-    else:
-        session['cart'][item_id] = quantity
-    
-    session.modified = True
+    cart_store.set(current_user.id, item_id, quantity)
     flash('Cart updated!', 'success')
     return redirect(url_for('cart'))
 
+def find_checkout_order(idempotency_key):
+    """Return the order already placed by the current user with this idempotency key"""
+    checkout_request = CheckoutRequest.query.filter_by(
+        user_id=current_user.id, idempotency_key=idempotency_key).first()
+    return checkout_request.order if checkout_request else None
+
+def place_order(priced, delivery_address, idempotency_key):
+    """Write the order, its items and the idempotency key in a single transaction"""
+    order = Order(user_id=current_user.id, restaurant_id=priced['restaurant_id'],
+                 total_amount=priced['total'], delivery_address=delivery_address)
+    db.session.add(order)
+    if idempotency_key:
+        db.session.add(CheckoutRequest(user_id=current_user.id,
+                                       idempotency_key=idempotency_key, order=order))
+    db.session.flush()
+    
+    # Bulk insert the order items in one executemany
+    db.session.execute(insert(OrderItem), [{
+        'order_id': order.id,
+        'menu_item_id': line['item'].id,
+        'quantity': line['quantity'],
+        'price': line['item'].price
+    } for line in priced['items']])
+    
+    queue_email(current_user.email, 'Order Confirmation', 
+               f'Your order #{order.id} has been placed successfully!')
+    queue_order_event(order)
+    
+    db.session.commit()
+    # Orders placed through other processes are counted on their next rebuild
+    menu_index.record_orders([line['item'].id for line in priced['items']])
+    return order
+
 @app.route('/checkout', methods=['GET', 'POST'])
 @login_required
 def checkout():
-    if 'cart' not in session or not session['cart']:
+    idempotency_key = request.form.get('idempotency_key', '')[:64] or None
+    
+    # A retried submit returns the order the first submit created
+    if request.method == 'POST' and idempotency_key:
+        if find_checkout_order(idempotency_key):
+            cart_store.clear(current_user.id)
+            flash('Order placed successfully!', 'success')
+            return redirect(url_for('order_history'))
+    
+    cart_items = cart_store.get(current_user.id)
+    if not cart_items:
+        flash('Your cart is empty!', 'error')
+        return redirect(url_for('menu'))
+    
+    priced = price_cart(cart_items)
+    if not priced['items']:
+        cart_store.clear(current_user.id)
         flash('Your cart is empty!', 'error')
         return redirect(url_for('menu'))
     
     if request.method == 'POST':
         delivery_address = request.form['delivery_address']
         
-        # Create order
-        total = 0
-        restaurant_id = None
-        
-        for item_id, quantity in session['cart'].items():
-            item = MenuItem.query.get(item_id)
-            if item:
-                total += item.price * quantity
-                restaurant_id = item.restaurant_id
-        
-        order = Order(user_id=current_user.id, restaurant_id=restaurant_id,
-                     total_amount=total, delivery_address=delivery_address)
-        db.session.add(order)
-        db.session.commit()
-        
-        # Create order items
-        for item_id, quantity in session['cart'].items():
-            item = MenuItem.query.get(item_id)
-            if item:
-                order_item = OrderItem(order_id=order.id, menu_item_id=item_id,
-                                     quantity=quantity, price=item.price)
-                db.session.add(order_item)
-        
-        db.session.commit()
+        try:
+            order = place_order(priced, delivery_address, idempotency_key)
+        except IntegrityError:
+            # A concurrent submit with the same key won the race
+            db.session.rollback()
+            if not idempotency_key or not find_checkout_order(idempotency_key):
+                raise
+            cart_store.clear(current_user.id)
+            flash('Order placed successfully!', 'success')
+            return redirect(url_for('order_history'))
         
         # Clear cart
-        session.pop('cart', None)
-        
-        # Send confirmation email
-        send_email(current_user.email, 'Order Confirmation', 
-                  f'Your order #{order.id} has been placed successfully!')
+        cart_store.clear(current_user.id)
         
         flash('Order placed successfully!', 'success')
         return redirect(url_for('order_history'))
     
-    cart_items = []
-    total = 0
-    
-    for item_id, quantity in session['cart'].items():
-        item = MenuItem.query.get(item_id)
-        if item:
-            cart_items.append({
-                'item': item,
-                'quantity': quantity,
-                'subtotal': item.price * quantity
-            })
-            total += item.price * quantity
-    
-    return render_template('checkout.html', items=cart_items, total=total)
+    return render_template('checkout.html', items=priced['items'], total=priced['total'],
+                         idempotency_key=uuid.uuid4().hex)
+
+ORDER_HISTORY_PAGE_SIZE = 20
+ORDER_HISTORY_MAX_PAGE_SIZE = 100
+
+def order_history_page(user_id, cursor=None, limit=ORDER_HISTORY_PAGE_SIZE):
+    """One keyset page of a user's orders as summary rows, newest first"""
+    item_count = select(func.coalesce(func.sum(OrderItem.quantity), 0)) \
+        .where(OrderItem.order_id == Order.id).scalar_subquery()
+    query = db.session.query(
+        Order.id, Order.created_at, Order.status, Order.total_amount,
+        Restaurant.name.label('restaurant_name'), item_count.label('item_count')) \
+        .outerjoin(Restaurant, Restaurant.id == Order.restaurant_id) \
+        .filter(Order.user_id == user_id)
+    return keyset_page(query, [Order.created_at, Order.id], cursor, limit)
+
+def order_history_summary(row):
+    return {
+        'id': row.id,
+        'created_at': row.created_at.strftime('%B %d, %Y at %I:%M %p'),
+        'status': row.status,
+        'total_amount': row.total_amount,
+        'restaurant_name': row.restaurant_name,
+        'item_count': row.item_count
+    }
 
 @app.route('/order_history')
 @login_required
 def order_history():
-    orders = Order.query.filter_by(user_id=current_user.id).order_by(Order.created_at.desc()).all()
-    return render_template('order_history.html', orders=orders)
+    orders, next_cursor = order_history_page(current_user.id)
+    return render_template('order_history.html',
+                           orders=[order_history_summary(row) for row in orders],
+                           orders_cursor=next_cursor)
 
-@app.route('/order_details/<int:order_id>')
+@app.route('/order_history/orders')
 @login_required
-def order_details(order_id):
-    order = Order.query.filter_by(id=order_id, user_id=current_user.id).first()
-    if not order:
-        return jsonify({'error': 'Order not found'}), 404
+def order_history_orders():
+    limit = min(max(request.args.get('limit', ORDER_HISTORY_PAGE_SIZE, type=int), 1),
+                ORDER_HISTORY_MAX_PAGE_SIZE)
+    try:
+        orders, next_cursor = order_history_page(current_user.id, request.args.get('cursor'), limit)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    order_data = {
+    return jsonify({'items': [order_history_summary(row) for row in orders],
+                    'next_cursor': next_cursor})
+
+# Details of orders in TERMINAL_STATUSES never change, so they can be cached
+ORDER_DETAILS_MAX_IDS = 50
+
+# (user_id, serialized details) of terminal orders, keyed by order id
+order_details_cache = IdentityCache(maxsize=app.config['ORDER_DETAILS_CACHE_SIZE'],
+                                    ttl=app.config['ORDER_DETAILS_CACHE_TTL'])
+
+def order_detail(order):
+    return {
         'id': order.id,
         'created_at': order.created_at.strftime('%B %d, %Y at %I:%M %p'),
         'status': order.status,
         'total_amount': order.total_amount,
         'delivery_address': order.delivery_address,
         'restaurant_name': order.restaurant.name,
-        'items': []
-    }
-    
-    for item in order.order_items:
-        order_data['items'].append({
+        # Line prices are the prices charged at checkout
+        'items': [{
             'name': item.menu_item.name,
             'quantity': item.quantity,
-            'price': item.menu_item.price,
-            'total': item.quantity * item.menu_item.price
-        })
+            'price': item.price,
+            'total': item.quantity * item.price
+        } for item in order.order_items]
+    }
+
+def load_order_details(order_ids):
+    """Serialized details of the current user's orders as {id: json}
+
+    Cached orders cost no queries; the rest are loaded together in three
+    (orders with restaurants, their items, the items' menu items).
+    """
+    details = {}
+    missing = []
+    for order_id in order_ids:
+        cached = order_details_cache.get(order_id)
+        if cached and cached[0] == current_user.id:
+            details[order_id] = cached[1]
+        else:
+            missing.append(order_id)
     
-    return jsonify(order_data)
+    if missing:
+        orders = Order.query.filter(Order.id.in_(missing), Order.user_id == current_user.id) \
+            .options(joinedload(Order.restaurant),
+                     selectinload(Order.order_items).selectinload(OrderItem.menu_item)).all()
+        for order in orders:
+            serialized = app.json.dumps(order_detail(order))
+            details[order.id] = serialized
+            if order.status in TERMINAL_STATUSES:
+                order_details_cache.set(order.id, (order.user_id, serialized))
+    return details
+
+@event.listens_for(db.session, 'after_flush')
+def _record_order_writes(session, flush_context):
+    changed = [obj.id for obj in list(session.dirty) + list(session.deleted)
+               if isinstance(obj, Order)]
+    if changed:
+        session.info.setdefault('order_changes', set()).update(changed)
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidate_order_details(session):
+    changed = session.info.pop('order_changes', None)
+    if changed:
+        order_details_cache.invalidate(*changed)
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_order_writes(session):
+    session.info.pop('order_changes', None)
+
+@app.route('/order_details/<int:order_id>')
+@login_required
+def order_details(order_id):
+    details = load_order_details([order_id])
+    if order_id not in details:
+        return jsonify({'error': 'Order not found'}), 404
+    
+    return Response(details[order_id], mimetype='application/json')
+
+@app.route('/order_details')
+@login_required
+def bulk_order_details():
+    """Details for ?ids=1,2,3 in one round-trip; unknown or foreign ids are listed as missing"""
+    try:
+        order_ids = [int(order_id) for value in request.args.getlist('ids')
+                     for order_id in value.split(',') if order_id.strip()]
+    except ValueError:
+        return jsonify({'error': 'Invalid order id'}), 400
+    order_ids = list(dict.fromkeys(order_ids))
+    if not order_ids:
+        return jsonify({'error': 'No order ids given'}), 400
+    if len(order_ids) > ORDER_DETAILS_MAX_IDS:
+        return jsonify({'error': f'At most {ORDER_DETAILS_MAX_IDS} orders per request'}), 400
+    
+    details = load_order_details(order_ids)
+    missing = [order_id for order_id in order_ids if order_id not in details]
+    
+    # Splice the cached JSON documents in without decoding them
+    body = '{"orders": [%s], "missing": %s}' % (
+        ', '.join(details[order_id] for order_id in order_ids if order_id in details),
+        app.json.dumps(missing))
+    return Response(body, mimetype='application/json')
+
+RESTAURANT_FEED_SIZE = 5
+RESTAURANT_MAX_FEED_SIZE = 50
+
+def restaurant_orders_page(restaurant_id, status=None, cursor=None, limit=RESTAURANT_FEED_SIZE):
+    """One keyset page of a restaurant's orders with items and menu items preloaded"""
+    query = Order.query.filter_by(restaurant_id=restaurant_id) \
+        .options(selectinload(Order.order_items).selectinload(OrderItem.menu_item))
+    if status:
+        query = query.filter(Order.status == status)
+    return keyset_page(query, [Order.created_at, Order.id], cursor, limit)
+
+def restaurant_order_summary(order):
+    return {
+        'id': order.id,
+        'created_at': order.created_at.strftime('%I:%M %p'),
+        'status': order.status,
+        'version': order.version,
+        'total_amount': order.total_amount,
+        'items': [{'quantity': item.quantity, 'name': item.menu_item.name}
+                  for item in order.order_items]
+    }
 
 @app.route('/restaurant_dashboard')
 @login_required
@@ -375,11 +951,33 @@ def restaurant_dashboard():
     
     categories = Category.query.filter_by(restaurant_id=restaurant.id).all()
     menu_items = MenuItem.query.filter_by(restaurant_id=restaurant.id).all()
-    orders = Order.query.filter_by(restaurant_id=restaurant.id).order_by(Order.created_at.desc()).all()
+    orders, orders_cursor = restaurant_orders_page(restaurant.id)
     
     return render_template('restaurant_dashboard.html', 
                          restaurant=restaurant, categories=categories, 
-                         menu_items=menu_items, orders=orders)
+                         menu_items=menu_items, orders=orders, orders_cursor=orders_cursor)
+
+@app.route('/restaurant/orders')
+@login_required
+def restaurant_orders():
+    if current_user.user_type != 'restaurant':
+        return jsonify({'error': 'Access denied'}), 403
+    
+    restaurant = Restaurant.query.filter_by(user_id=current_user.id).first()
+    if not restaurant:
+        return jsonify({'error': 'Restaurant not found'}), 404
+    
+    limit = min(max(request.args.get('limit', RESTAURANT_FEED_SIZE, type=int), 1),
+                RESTAURANT_MAX_FEED_SIZE)
+    try:
+        orders, next_cursor = restaurant_orders_page(
+            restaurant.id, status=request.args.get('status') or None,
+            cursor=request.args.get('cursor'), limit=limit)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({'items': [restaurant_order_summary(o) for o in orders],
+                    'next_cursor': next_cursor})
 
 @app.route('/add_menu_item', methods=['POST'])
 @login_required
@@ -414,39 +1012,448 @@ def add_menu_item():
     flash('Menu item added successfully!', 'success')
     return redirect(url_for('restaurant_dashboard'))
 
+image_fetcher = ImageFetcher(app.config['UPLOAD_FOLDER'],
+                             max_workers=app.config['MENU_IMPORT_IMAGE_WORKERS'],
+                             timeout=app.config['MENU_IMPORT_IMAGE_TIMEOUT'],
+                             max_bytes=app.config['MAX_CONTENT_LENGTH'])
+
+MENU_IMPORT_MAX_ERRORS = 100
+MENU_EXPORT_CHUNK_SIZE = 500
+
+def local_upload_exists(image):
+    """True for an uploads/ path (as exported) that exists under static/"""
+    if not image.startswith('uploads/') or '..' in image.split('/'):
+        return False
+    return os.path.isfile(os.path.join(app.static_folder, image))
+
+def record_imported_image(restaurant_id, item_ids, url, future):
+    """Point imported items at their downloaded image (runs on the fetcher's thread)"""
+    try:
+        image = future.result()
+    except Exception as e:
+        log_event(logger, 'menu.import_image_failed', logging.WARNING, f"Imported image not added: {e}",
+                  restaurant_id=restaurant_id, menu_item_ids=item_ids, url=url)
+        return
+    
+    with app.app_context():
+        # Skip items deleted or given an image in the meantime; variants are
+        # queued when this commits
+        items = MenuItem.query.filter(MenuItem.id.in_(item_ids), MenuItem.image.is_(None)).all()
+        for item in items:
+            item.image = image
+        db.session.commit()
+
+def import_menu_rows(restaurant_id, rows, batch_size, max_rows, max_image_urls):
+    """Validate streamed (line, row, error) tuples and insert them in batched transactions
+
+    Categories are matched by name (case-insensitively) and created when
+    missing. Items with an image URL are saved without an image, and each
+    distinct URL (at most max_image_urls per import) is downloaded in the
+    background once every batch is written. Returns counts plus the first
+    MENU_IMPORT_MAX_ERRORS per-row errors.
+    """
+    summary = {'imported': 0, 'failed': 0, 'categories_created': 0, 'images_queued': 0, 'errors': []}
+    categories = {name.lower(): category_id for category_id, name in db.session.execute(
+        select(Category.id, Category.name).where(Category.restaurant_id == restaurant_id))}
+    remote_images = {}  # url -> ids of the committed items that use it
+    
+    def fail(line, error):
+        summary['failed'] += 1
+        if len(summary['errors']) < MENU_IMPORT_MAX_ERRORS:
+            summary['errors'].append({'line': line, 'error': error})
+    
+    def write(batch):
+        known_categories = dict(categories)
+        items = []
+        for line, values in batch:
+            image = values.pop('image')
+            url = image if image and is_remote(image) else None
+            
+            category_name = values.pop('category')
+            category_id = categories.get(category_name.lower())
+            if category_id is None:
+                category = Category(name=category_name, restaurant_id=restaurant_id)
+                db.session.add(category)
+                db.session.flush()
+                category_id = categories[category_name.lower()] = category.id
+            items.append((line, url, MenuItem(category_id=category_id, restaurant_id=restaurant_id,
+                                              image=None if url else image, **values)))
+        
+        try:
+            db.session.add_all([item for _, _, item in items])
+            db.session.flush()
+            # Read before commit expires the objects
+            new_urls = [(item.id, url) for _, url, item in items if url]
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            logger.exception("Menu import batch failed", extra={
+                'event': 'menu.import_batch_failed', 'restaurant_id': restaurant_id})
+            categories.clear()
+            categories.update(known_categories)
+            for line, _, _ in items:
+                fail(line, 'Could not save row')
+            return
+        
+        summary['imported'] += len(items)
+        summary['categories_created'] += len(categories) - len(known_categories)
+        for item_id, url in new_urls:
+            remote_images[url].append(item_id)
+    
+    batch = []
+    for count, (line, row, error) in enumerate(rows, 1):
+        if count > max_rows:
+            fail(line, f'Imports are limited to {max_rows} rows; the rest of the file was skipped')
+            break
+        if error is None:
+            try:
+                values = validate_row(row)
+            except RowError as e:
+                error = str(e)
+            else:
+                image = values['image']
+                if image and is_remote(image):
+                    if image not in remote_images and len(remote_images) >= max_image_urls:
+                        error = f'Imports are limited to {max_image_urls} different image URLs'
+                    else:
+                        remote_images.setdefault(image, [])
+                elif image and not local_upload_exists(image):
+                    error = 'image must be an http(s) URL or an existing uploads/ path'
+        if error:
+            fail(line, error)
+            continue
+        
+        batch.append((line, values))
+        if len(batch) >= batch_size:
+            write(batch)
+            batch = []
+    if batch:
+        write(batch)
+    
+    for url, item_ids in remote_images.items():
+        if item_ids:
+            image_fetcher.submit(url, lambda future, url=url, item_ids=item_ids:
+                                 record_imported_image(restaurant_id, item_ids, url, future))
+            summary['images_queued'] += 1
+    return summary
+
+@app.route('/restaurant/menu/import', methods=['POST'])
+@login_required
+def import_menu():
+    """Import menu items from an uploaded CSV or JSON-lines file ("file" field)"""
+    if current_user.user_type != 'restaurant':
+        return jsonify({'error': 'Access denied'}), 403
+    
+    restaurant = Restaurant.query.filter_by(user_id=current_user.id).first()
+    if not restaurant:
+        return jsonify({'error': 'Restaurant not found'}), 404
+    
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        return jsonify({'error': 'No file uploaded'}), 400
+    file_format = request.form.get('format') or detect_format(upload.filename, upload.mimetype)
+    if not file_format:
+        return jsonify({'error': 'Upload a .csv or .jsonl file'}), 400
+    
+    try:
+        rows = read_rows(upload.stream, file_format)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    summary = import_menu_rows(restaurant.id, rows, app.config['MENU_IMPORT_BATCH_SIZE'],
+                               app.config['MENU_IMPORT_MAX_ROWS'], app.config['MENU_IMPORT_MAX_IMAGE_URLS'])
+    log_event(logger, 'menu.imported', restaurant_id=restaurant.id, user_id=current_user.id,
+              imported=summary['imported'], failed=summary['failed'],
+              categories_created=summary['categories_created'])
+    return jsonify(summary)
+
+@app.route('/restaurant/menu/export')
+@login_required
+def export_menu():
+    """Stream the restaurant's menu as CSV or JSON lines, MENU_EXPORT_CHUNK_SIZE items per query"""
+    if current_user.user_type != 'restaurant':
+        return jsonify({'error': 'Access denied'}), 403
+    
+    restaurant = Restaurant.query.filter_by(user_id=current_user.id).first()
+    if not restaurant:
+        return jsonify({'error': 'Restaurant not found'}), 404
+    
+    file_format = request.args.get('format', 'csv')
+    if file_format not in FORMATS:
+        return jsonify({'error': 'format must be csv or jsonl'}), 400
+    restaurant_id = restaurant.id
+    
+    def generate():
+        last_id = 0
+        header = True
+        while True:
+            rows = db.session.execute(
+                select(MenuItem.id, MenuItem.name, MenuItem.description, MenuItem.price,
+                       Category.name.label('category'), MenuItem.is_vegetarian,
+                       MenuItem.is_available, MenuItem.image)
+                .join(Category, Category.id == MenuItem.category_id)
+                .where(MenuItem.restaurant_id == restaurant_id, MenuItem.id > last_id)
+                .order_by(MenuItem.id).limit(MENU_EXPORT_CHUNK_SIZE)).mappings().all()
+            # Don't hold a read transaction open while the client downloads
+            db.session.close()
+            if rows or header:
+                yield export_chunk(rows, file_format, header=header)
+            header = False
+            if len(rows) < MENU_EXPORT_CHUNK_SIZE:
+                return
+            last_id = rows[-1]['id']
+    
+    return Response(stream_with_context(generate()), mimetype=FORMATS[file_format], headers={
+        'Content-Disposition': f'attachment; filename=menu-{restaurant_id}.{file_format}'})
+
+@app.template_global()
+def order_transitions():
+    """{status: [next statuses]} for the dashboard's status selects"""
+    return {status: list(targets) for status, targets in ORDER_TRANSITIONS.items()}
+
+ORDER_STATUS_BULK_MAX = 100
+
+def apply_status_updates(restaurant_id, updates):
+    """Move a restaurant's orders to new statuses in the current transaction
+
+    updates is a list of (order_id, status, version or None). The orders are
+    read with one query and changed with one conditional UPDATE per target
+    status that matches each order's (id, version), so an order changed by
+    someone else in the meantime is reported as a conflict instead of being
+    overwritten. Returns one result dict per update, in order.
+    """
+    current = {row.id: row for row in db.session.execute(
+        select(Order.id, Order.status, Order.version, User.email)
+        .outerjoin(User, User.id == Order.user_id)
+        .where(Order.id.in_([order_id for order_id, _, _ in updates]),
+               Order.restaurant_id == restaurant_id))}
+    
+    results = []
+    targets = {}  # status -> {(order_id, version): result}
+    seen = set()
+    for order_id, status, version in updates:
+        row = current.get(order_id)
+        result = {'id': order_id, 'ok': False}
+        results.append(result)
+        if row is None:
+            result['error'] = 'Order not found'
+            continue
+        result.update(status=row.status, version=row.version)
+        if order_id in seen:
+            result['error'] = 'Order listed more than once'
+            continue
+        seen.add(order_id)
+        if version is not None and version != row.version:
+            result['error'] = 'Order was changed by someone else'
+            continue
+        try:
+            check_transition(row.status, status)
+        except InvalidTransition as e:
+            result['error'] = str(e)
+            continue
+        targets.setdefault(status, {})[(order_id, row.version)] = result
+    
+    for status, pending in targets.items():
+        changed = db.session.execute(
+            update(Order)
+            # The plain id list lets SQLite use the primary key; it cannot for row values
+            .where(Order.id.in_([order_id for order_id, _ in pending]),
+                   tuple_(Order.id, Order.version).in_(list(pending)),
+                   Order.status.in_(source_statuses(status)))
+            .values(status=status, version=Order.version + 1)
+            .returning(Order.id, Order.user_id, Order.restaurant_id, Order.status,
+                       Order.version, Order.total_amount, Order.created_at),
+            execution_options={'synchronize_session': False}).all()
+        
+        for order in changed:
+            result = pending.pop((order.id, order.version - 1))
+            previous_status = result['status']
+            result.update(ok=True, status=order.status, version=order.version)
+            
+            # Queue the email notification with the status change
+            if current[order.id].email:
+                queue_email(current[order.id].email, f'Order #{order.id} Status Update',
+                           f'Your order status has been updated to: {status}')
+            queue_order_event(order)
+            log_event(logger, 'order.status_changed', order_id=order.id, user_id=order.user_id,
+                      restaurant_id=order.restaurant_id, updated_by=current_user.id,
+                      from_status=previous_status, to_status=status)
+        # Core UPDATEs skip the flush listeners, so record the changes for cache invalidation
+        db.session.info.setdefault('order_changes', set()).update(order.id for order in changed)
+        
+        for result in pending.values():
+            result['error'] = 'Order was changed by someone else'
+    return results
+
 @app.route('/update_order_status', methods=['POST'])
 @login_required
 def update_order_status():
     if current_user.user_type != 'restaurant':
         return jsonify({'error': 'Access denied'}), 403
     
-    order_id = request.form.get('order_id')
+    order_id = request.form.get('order_id', type=int)
     status = request.form.get('status')
     
-    print(f"DEBUG: Updating order {order_id} to status {status}")  # Debug line
-    
     if not order_id or not status:
         flash('Missing order ID or status!', 'error')
         return redirect(url_for('restaurant_dashboard'))
     
-    order = Order.query.get(order_id)
-    if order:
-        print(f"DEBUG: Found order {order.id}, current status: {order.status}")  # Debug line
-        order.status = status
+    restaurant = Restaurant.query.filter_by(user_id=current_user.id).first()
+    if not restaurant:
+        flash('Restaurant profile not found!', 'error')
+        return redirect(url_for('index'))
+    
+    result = apply_status_updates(
+        restaurant.id, [(order_id, status, request.form.get('version', type=int))])[0]
+    if result['ok']:
         db.session.commit()
-        print(f"DEBUG: Updated order {order.id} to status: {order.status}")  # Debug line
-        
-        # Send email notification
-        send_email(order.user.email, f'Order #{order.id} Status Update', 
-                  f'Your order status has been updated to: {status}')
-        
         flash('Order status updated!', 'success')
     else:
-        print(f"DEBUG: Order {order_id} not found!")  # Debug line
-        flash('Order not found!', 'error')
+        db.session.rollback()
+        log_event(logger, 'order.status_rejected', logging.WARNING, order_id=order_id,
+                  restaurant_id=restaurant.id, updated_by=current_user.id,
+                  to_status=status, reason=result['error'])
+        flash(f"{result['error']}!", 'error')
     
     return redirect(url_for('restaurant_dashboard'))
 
+@app.route('/restaurant/orders/status', methods=['POST'])
+@login_required
+def bulk_update_order_status():
+    """Apply {"updates": [{"id": 1, "status": "dispatched", "version": 3}, ...]} in one transaction
+
+    version is optional; when given, the update only applies if the order is
+    still at that version. Each order gets its own result, so some updates
+    can succeed while others are rejected.
+    """
+    if current_user.user_type != 'restaurant':
+        return jsonify({'error': 'Access denied'}), 403
+    
+    restaurant = Restaurant.query.filter_by(user_id=current_user.id).first()
+    if not restaurant:
+        return jsonify({'error': 'Restaurant not found'}), 404
+    
+    data = request.get_json(silent=True) or {}
+    entries = data.get('updates') if isinstance(data, dict) else None
+    if not isinstance(entries, list) or not entries:
+        return jsonify({'error': 'updates must be a non-empty list'}), 400
+    if len(entries) > ORDER_STATUS_BULK_MAX:
+        return jsonify({'error': f'At most {ORDER_STATUS_BULK_MAX} updates per request'}), 400
+    
+    updates = []
+    for entry in entries:
+        entry = entry if isinstance(entry, dict) else {}
+        order_id, status, version = entry.get('id'), entry.get('status'), entry.get('version')
+        if (type(order_id) is not int or not isinstance(status, str)
+                or (version is not None and type(version) is not int)):
+            return jsonify({'error': 'Each update needs an integer id, a status and an optional integer version'}), 400
+        updates.append((order_id, status, version))
+    
+    results = apply_status_updates(restaurant.id, updates)
+    db.session.commit()
+    
+    return jsonify({'results': results, 'updated': sum(1 for result in results if result['ok'])})
+
+@app.route('/events/orders')
+@login_required
+def order_event_stream():
+    """Server-Sent Events stream of order changes visible to the current user"""
+    if current_user.user_type == 'admin':
+        channel = 'admin'
+    elif current_user.user_type == 'restaurant':
+        restaurant = Restaurant.query.filter_by(user_id=current_user.id).first()
+        if not restaurant:
+            return jsonify({'error': 'Restaurant not found'}), 404
+        channel = f"restaurant:{restaurant.id}"
+    else:
+        channel = f"user:{current_user.id}"
+    
+    # Release the DB connection before the long-lived stream starts
+    db.session.remove()
+    
+    try:
+        subscription = order_events.subscribe(channel)
+    except TooManySubscribers:
+        # Every open stream holds a worker thread; turn new ones away instead
+        # of starving ordinary requests
+        response = jsonify({'error': 'Too many live update streams, try again later'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '30'
+        return response
+    response = Response(sse_stream(order_events, subscription, app.config['SSE_HEARTBEAT_SECONDS'],
+                                   app.config['SSE_MAX_STREAM_SECONDS']),
+                        mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+ADMIN_PANEL_SIZES = {'users': 5, 'restaurants': 5, 'orders': 10}
+ADMIN_MAX_PAGE_SIZE = 100
+
+def admin_stats():
+    """Headline counts and revenue computed in a single aggregate query"""
+    row = db.session.execute(select(
+        select(func.count(User.id)).scalar_subquery(),
+        select(func.count(Restaurant.id)).scalar_subquery(),
+        select(func.count(Order.id)).scalar_subquery(),
+        select(func.coalesce(func.sum(Order.total_amount), 0)).scalar_subquery()
+    )).one()
+    return {'users': row[0], 'restaurants': row[1], 'orders': row[2], 'revenue': row[3]}
+
+def admin_users_page(search=None, cursor=None, limit=ADMIN_PANEL_SIZES['users']):
+    query = User.query
+    if search:
+        pattern = f"%{search}%"
+        query = query.filter(or_(User.name.ilike(pattern), User.email.ilike(pattern)))
+    return keyset_page(query, [User.id], cursor, limit, descending=False)
+
+def admin_restaurants_page(search=None, cursor=None, limit=ADMIN_PANEL_SIZES['restaurants']):
+    query = Restaurant.query
+    if search:
+        pattern = f"%{search}%"
+        query = query.filter(or_(Restaurant.name.ilike(pattern), Restaurant.location.ilike(pattern)))
+    return keyset_page(query, [Restaurant.id], cursor, limit, descending=False)
+
+def admin_orders_page(search=None, status=None, cursor=None, limit=ADMIN_PANEL_SIZES['orders']):
+    # Join the customer and restaurant once and populate both relationships from it;
+    # outer joins keep orders whose customer account has been removed
+    query = Order.query.outerjoin(Order.user).outerjoin(Order.restaurant) \
+        .options(contains_eager(Order.user), contains_eager(Order.restaurant))
+    if status:
+        query = query.filter(Order.status == status)
+    if search:
+        pattern = f"%{search}%"
+        conditions = [User.name.ilike(pattern), Restaurant.name.ilike(pattern)]
+        if search.lstrip('#').isdigit():
+            conditions.append(Order.id == int(search.lstrip('#')))
+        query = query.filter(or_(*conditions))
+    return keyset_page(query, [Order.created_at, Order.id], cursor, limit)
+
+def user_summary(user):
+    return {'id': user.id, 'name': user.name, 'email': user.email, 'user_type': user.user_type}
+
+def restaurant_summary(restaurant):
+    return {'id': restaurant.id, 'name': restaurant.name, 'contact': restaurant.contact,
+            'location': restaurant.location}
+
+def admin_order_summary(order):
+    return {
+        'id': order.id,
+        'customer_name': order.user.name if order.user else None,
+        'restaurant_name': order.restaurant.name if order.restaurant else None,
+        'total_amount': order.total_amount,
+        'status': order.status,
+        'created_at': order.created_at.strftime('%m/%d/%Y %I:%M %p')
+    }
+
+def admin_page_args(default_limit):
+    limit = request.args.get('limit', default_limit, type=int)
+    return {
+        'search': request.args.get('q', '').strip() or None,
+        'cursor': request.args.get('cursor'),
+        'limit': min(max(limit, 1), ADMIN_MAX_PAGE_SIZE)
+    }
+
 @app.route('/admin_dashboard')
 @login_required
 def admin_dashboard():
@@ -454,14 +1461,55 @@ def admin_dashboard():
         flash('Access denied!', 'error')
         return redirect(url_for('index'))
     
-    users = User.query.all()
-    restaurants = Restaurant.query.all()
-    orders = Order.query.order_by(Order.created_at.desc()).all()
+    users, users_cursor = admin_users_page()
+    restaurants, restaurants_cursor = admin_restaurants_page()
+    orders, orders_cursor = admin_orders_page()
     
-    return render_template('admin_dashboard.html', users=users, 
-                         restaurants=restaurants, orders=orders)
+    return render_template('admin_dashboard.html', stats=admin_stats(),
+                         users=users, users_cursor=users_cursor,
+                         restaurants=restaurants, restaurants_cursor=restaurants_cursor,
+                         orders=orders, orders_cursor=orders_cursor)
+
+@app.route('/admin/users')
+@login_required
+def admin_users():
+    if current_user.user_type != 'admin':
+        return jsonify({'error': 'Access denied'}), 403
+    
+    try:
+        users, next_cursor = admin_users_page(**admin_page_args(ADMIN_PANEL_SIZES['users']))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'items': [user_summary(u) for u in users], 'next_cursor': next_cursor})
+
+@app.route('/admin/restaurants')
+@login_required
+def admin_restaurants():
+    if current_user.user_type != 'admin':
+        return jsonify({'error': 'Access denied'}), 403
+    
+    try:
+        restaurants, next_cursor = admin_restaurants_page(
+            **admin_page_args(ADMIN_PANEL_SIZES['restaurants']))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'items': [restaurant_summary(r) for r in restaurants], 'next_cursor': next_cursor})
+
+@app.route('/admin/orders')
+@login_required
+def admin_orders():
+    if current_user.user_type != 'admin':
+        return jsonify({'error': 'Access denied'}), 403
+    
+    try:
+        orders, next_cursor = admin_orders_page(status=request.args.get('status') or None,
+                                                **admin_page_args(ADMIN_PANEL_SIZES['orders']))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'items': [admin_order_summary(o) for o in orders], 'next_cursor': next_cursor})
 
 if __name__ == '__main__':
+    from migrations import upgrade
     with app.app_context():
-        db.create_all()
+        upgrade(db)
     app.run(debug=True) 
\ No newline at end of file
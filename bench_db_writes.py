@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Concurrent write benchmark for the database profiles.
+
+Runs checkout-shaped transactions (insert an order and its items, then update
+the order status) from several threads against a scratch SQLite database,
+once with the default settings and once with the production PRAGMAs, and
+reports throughput, latency and "database is locked" errors for each.
+
+Usage:
+    python bench_db_writes.py [--threads 8] [--orders 200]
+    python bench_db_writes.py --url postgresql://...   # single run against that URL
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import create_engine, insert, update
+from sqlalchemy.exc import OperationalError
+
+from app import db, Order, OrderItem, User, Restaurant, Category, MenuItem
+from config import Config, ProductionConfig
+from db_profile import apply_sqlite_pragmas
+
+
+def seed(engine):
+    db.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(insert(User).values(
+            id=1, name='Bench', email='bench@example.com', phone='0', address='x',
+            password_hash='x', user_type='customer'))
+        connection.execute(insert(Restaurant).values(id=1, name='Bench', contact='0', location='x', user_id=1))
+        connection.execute(insert(Category).values(id=1, name='Bench', restaurant_id=1))
+        connection.execute(insert(MenuItem), [
+            {'id': i, 'name': f'Item {i}', 'description': 'x', 'price': 9.99,
+             'category_id': 1, 'restaurant_id': 1} for i in range(1, 11)])
+
+
+def place_and_update(engine):
+    """One checkout transaction followed by one status-update transaction"""
+    with engine.begin() as connection:
+        order_id = connection.execute(insert(Order).values(
+            user_id=1, restaurant_id=1, total_amount=29.97, status='pending',
+            delivery_address='x', created_at=datetime.utcnow())).inserted_primary_key[0]
+        connection.execute(insert(OrderItem), [
+            {'order_id': order_id, 'menu_item_id': i, 'quantity': 1, 'price': 9.99}
+            for i in range(1, 4)])
+    with engine.begin() as connection:
+        connection.execute(update(Order).where(Order.id == order_id).values(status='confirmed'))
+
+
+def run(engine, threads, orders_per_thread):
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def worker():
+        for _ in range(orders_per_thread):
+            start = time.perf_counter()
+            try:
+                place_and_update(engine)
+            except OperationalError as e:
+                with lock:
+                    errors.append(str(e.orig))
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    started = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'completed': len(latencies),
+        'errors': len(errors),
+        'locked_errors': sum('locked' in e for e in errors),
+        'orders_per_sec': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_ms': statistics.median(latencies) * 1000 if latencies else 0.0,
+        'p95_ms': latencies[int(len(latencies) * 0.95) - 1] * 1000 if latencies else 0.0,
+    }
+
+
+def bench_profile(name, url, engine_options, pragmas, threads, orders_per_thread):
+    engine = create_engine(url, **engine_options)
+    apply_sqlite_pragmas(engine, pragmas)
+    seed(engine)
+    result = run(engine, threads, orders_per_thread)
+    engine.dispose()
+
+    print(f"{name:<12} {result['completed']:>6} ok  {result['errors']:>4} errors "
+          f"({result['locked_errors']} locked)  {result['orders_per_sec']:>8.1f} orders/s  "
+          f"p50 {result['p50_ms']:>7.1f} ms  p95 {result['p95_ms']:>7.1f} ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--orders', type=int, default=200, help='orders per thread')
+    parser.add_argument('--url', help='benchmark this database URL with the production pool options')
+    args = parser.parse_args()
+
+    print(f"{args.threads} threads x {args.orders} orders")
+    print("-" * 50)
+
+    if args.url:
+        bench_profile('custom', args.url, ProductionConfig.SQLALCHEMY_ENGINE_OPTIONS, {},
+                      args.threads, args.orders)
+        return
+
+    with tempfile.TemporaryDirectory() as scratch:
+        bench_profile('default', 'sqlite:///' + os.path.join(scratch, 'default.db'),
+                      {}, Config.SQLITE_PRAGMAS, args.threads, args.orders)
+        bench_profile('production', 'sqlite:///' + os.path.join(scratch, 'production.db'),
+                      ProductionConfig.SQLALCHEMY_ENGINE_OPTIONS, ProductionConfig.SQLITE_PRAGMAS,
+                      args.threads, args.orders)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Login throughput benchmark for the password hashing schemes.
+
+For each scheme, hashes one password with the configured parameters and then
+verifies it from several concurrent "login" threads through a PasswordHasher
+pool, reporting logins per second overall and per core along with latency.
+
+Usage:
+    python bench_passwords.py [--logins 40] [--clients 8] [--workers N]
+    python bench_passwords.py --scheme bcrypt --executor process
+"""
+
+import argparse
+import os
+import statistics
+import threading
+import time
+
+from config import Config
+from passwords import SCHEMES, PasswordHasher
+
+
+def bench_scheme(scheme, args):
+    hasher = PasswordHasher(scheme=scheme, params=Config.PASSWORD_SCHEME_PARAMS.get(scheme),
+                            workers=args.workers, max_pending=args.clients, executor=args.executor)
+    stored = hasher.hash('customer123')
+    hasher.verify('customer123', stored)  # warm the pool
+
+    latencies = []
+    lock = threading.Lock()
+    per_client = max(1, args.logins // args.clients)
+
+    def client():
+        for _ in range(per_client):
+            start = time.perf_counter()
+            assert hasher.verify('customer123', stored)
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=client) for _ in range(args.clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    hasher.shutdown()
+
+    latencies.sort()
+    rate = len(latencies) / elapsed
+    cores = min(args.workers, os.cpu_count() or 1)
+    print(f"{scheme:<8} {str(hasher.params):<44} {rate:>8.1f} logins/s  "
+          f"{rate / cores:>8.1f} /s/core  p50 {statistics.median(latencies) * 1000:>7.1f} ms  "
+          f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:>7.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--scheme', choices=SCHEMES, help='only benchmark this scheme')
+    parser.add_argument('--logins', type=int, default=40, help='total logins per scheme')
+    parser.add_argument('--clients', type=int, default=8, help='concurrent login threads')
+    parser.add_argument('--workers', type=int, default=Config.PASSWORD_HASH_WORKERS, help='hashing pool size')
+    parser.add_argument('--executor', choices=('thread', 'process'), default=Config.PASSWORD_HASH_EXECUTOR)
+    args = parser.parse_args()
+
+    print(f"{args.clients} clients, {args.workers} {args.executor} workers, {os.cpu_count()} cores")
+    print("-" * 50)
+    for scheme in ([args.scheme] if args.scheme else SCHEMES):
+        bench_scheme(scheme, args)
+
+
+if __name__ == '__main__':
+    main()
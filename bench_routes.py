@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+Load-testing benchmark for the application routes.
+
+Seeds a scratch database with a configurable dataset, then drives the routes
+with concurrent simulated customers, restaurant owners and admins through
+the Flask test client. Reports p50/p95/p99 latency, throughput and SQL
+statements per request for each route, and saves the results as JSON so a
+later run can be compared against them. Everything runs in-process; no
+server or network is needed.
+
+Usage:
+    python bench_routes.py [--users 16] [--iterations 20] [--output results.json]
+    python bench_routes.py --restaurants 50 --items 40 --customers 2000 --orders 10
+    python bench_routes.py --compare baseline.json   # exit 1 on p95 or SQL regressions
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import re
+import shutil
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+# Share of simulated users per role
+ROLE_WEIGHTS = {'customer': 0.8, 'restaurant': 0.15, 'admin': 0.05}
+
+ORDER_STATUSES = ['pending', 'confirmed', 'preparing', 'dispatched', 'delivered', 'cancelled']
+CATEGORY_NAMES = ['Pizza', 'Pasta', 'Salads', 'Beverages', 'Desserts']
+CHUNK_SIZE = 5000
+
+
+def chunked_insert(connection, table, rows):
+    for start in range(0, len(rows), CHUNK_SIZE):
+        connection.execute(table.insert(), rows[start:start + CHUNK_SIZE])
+
+
+def seed(db, args):
+    """Bulk-insert the benchmark dataset; returns the ids the simulated users need"""
+    from app import User, Restaurant, Category, MenuItem, Order, OrderItem
+
+    rng = random.Random(args.seed)
+    now = datetime.utcnow()
+    users, restaurants, categories, items, orders, lines = [], [], [], [], [], []
+
+    users.append({'id': 1, 'name': 'Bench Admin', 'email': 'admin@bench.local', 'phone': '0',
+                  'address': 'x', 'password_hash': 'x', 'user_type': 'admin'})
+    item_id = 0
+    restaurant_items = {}
+    for r in range(1, args.restaurants + 1):
+        owner_id = len(users) + 1
+        users.append({'id': owner_id, 'name': f'Owner {r}', 'email': f'owner{r}@bench.local',
+                      'phone': '0', 'address': 'x', 'password_hash': 'x', 'user_type': 'restaurant'})
+        restaurants.append({'id': r, 'name': f'Restaurant {r}', 'contact': '0', 'location': 'x',
+                            'user_id': owner_id})
+        category_ids = []
+        for name in CATEGORY_NAMES:
+            category_ids.append(len(categories) + 1)
+            categories.append({'id': len(categories) + 1, 'name': name, 'restaurant_id': r})
+        restaurant_items[r] = []
+        for i in range(args.items):
+            item_id += 1
+            items.append({'id': item_id, 'name': f'Item {r}-{i}', 'description': 'Benchmark item',
+                          'price': round(rng.uniform(3, 30), 2), 'is_available': True,
+                          'is_vegetarian': rng.random() < 0.3,
+                          'category_id': category_ids[i % len(category_ids)], 'restaurant_id': r})
+            restaurant_items[r].append((item_id, items[-1]['price']))
+
+    customer_ids = []
+    for c in range(args.customers):
+        customer_ids.append(len(users) + 1)
+        users.append({'id': customer_ids[-1], 'name': f'Customer {c}', 'email': f'customer{c}@bench.local',
+                      'phone': '0', 'address': 'x', 'password_hash': 'x', 'user_type': 'customer'})
+
+    customer_orders = defaultdict(list)
+    for customer_id in customer_ids:
+        for _ in range(args.orders):
+            order_id = len(orders) + 1
+            restaurant_id = rng.randint(1, args.restaurants)
+            chosen = rng.sample(restaurant_items[restaurant_id], min(rng.randint(1, 4), args.items))
+            total = 0
+            for menu_item_id, price in chosen:
+                quantity = rng.randint(1, 3)
+                total += price * quantity
+                lines.append({'order_id': order_id, 'menu_item_id': menu_item_id,
+                              'quantity': quantity, 'price': price})
+            orders.append({'id': order_id, 'user_id': customer_id, 'restaurant_id': restaurant_id,
+                           'total_amount': round(total, 2), 'status': rng.choice(ORDER_STATUSES),
+                           'delivery_address': 'x',
+                           'created_at': now - timedelta(minutes=rng.randint(0, 90 * 24 * 60))})
+            customer_orders[customer_id].append(order_id)
+
+    with db.engine.begin() as connection:
+        for model, rows in ((User, users), (Restaurant, restaurants), (Category, categories),
+                            (MenuItem, items), (Order, orders), (OrderItem, lines)):
+            chunked_insert(connection, model.__table__, rows)
+
+    restaurant_orders = defaultdict(list)
+    for order in orders:
+        restaurant_orders[order['restaurant_id']].append(order['id'])
+
+    print(f"Seeded {len(users)} users, {len(restaurants)} restaurants, {len(items)} items, "
+          f"{len(orders)} orders, {len(lines)} order items")
+    return {
+        'admin_id': 1,
+        'customers': customer_ids,
+        'owners': {r['user_id']: r['id'] for r in restaurants},
+        'restaurant_items': {r: [item for item, _ in entries] for r, entries in restaurant_items.items()},
+        'customer_orders': customer_orders,
+        'restaurant_orders': restaurant_orders,
+    }
+
+
+class Recorder:
+    """Collects (route, latency, statements, status) samples from every thread"""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+
+        self.samples = defaultdict(list)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        event.listen(engine, 'before_cursor_execute', self._count)
+
+    def _count(self, *args):
+        self._local.statements = getattr(self._local, 'statements', 0) + 1
+
+    def request(self, client, label, method, path, **kwargs):
+        self._local.statements = 0
+        start = time.perf_counter()
+        response = client.open(path, method=method, **kwargs)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.samples[label].append((elapsed, self._local.statements, response.status_code))
+        return response
+
+
+def customer_session(recorder, client, rng, data):
+    restaurant_id = rng.choice(list(data['restaurant_items']))
+    recorder.request(client, 'menu', 'GET', '/menu')
+    for item_id in rng.sample(data['restaurant_items'][restaurant_id],
+                              min(2, len(data['restaurant_items'][restaurant_id]))):
+        recorder.request(client, 'add_to_cart', 'POST', '/add_to_cart',
+                         data={'item_id': item_id, 'quantity': rng.randint(1, 3)})
+    recorder.request(client, 'cart', 'GET', '/cart')
+    page = recorder.request(client, 'checkout', 'GET', '/checkout').get_data(as_text=True)
+    key = re.search(r'name="idempotency_key" value="(\w+)"', page)
+    recorder.request(client, 'checkout_submit', 'POST', '/checkout',
+                     data={'delivery_address': 'Bench Street', 'idempotency_key': key.group(1) if key else ''})
+    recorder.request(client, 'order_history', 'GET', '/order_history')
+    orders = data['customer_orders'].get(client.user_id)
+    if orders:
+        recorder.request(client, 'order_details', 'GET', f'/order_details/{rng.choice(orders)}')
+
+
+def restaurant_session(recorder, client, rng, data):
+    recorder.request(client, 'restaurant_dashboard', 'GET', '/restaurant_dashboard')
+    orders = data['restaurant_orders'].get(data['owners'][client.user_id])
+    if orders:
+        recorder.request(client, 'update_order_status', 'POST', '/update_order_status',
+                         data={'order_id': rng.choice(orders), 'status': rng.choice(ORDER_STATUSES)})
+        # A kitchen moving a batch of orders at once; disallowed transitions are rejected per order
+        batch = rng.sample(orders, min(30, len(orders)))
+        recorder.request(client, 'bulk_order_status', 'POST', '/restaurant/orders/status',
+                         json={'updates': [{'id': order_id, 'status': rng.choice(ORDER_STATUSES)}
+                                           for order_id in batch]})
+
+
+def admin_session(recorder, client, rng, data):
+    recorder.request(client, 'admin_dashboard', 'GET', '/admin_dashboard')
+
+
+SESSIONS = {'customer': customer_session, 'restaurant': restaurant_session, 'admin': admin_session}
+
+
+def make_client(app, user_id):
+    client = app.test_client()
+    client.user_id = user_id
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(user_id)
+        sess['_fresh'] = True
+    return client
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(p / 100 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(samples, elapsed):
+    routes = {}
+    for label, entries in sorted(samples.items()):
+        latencies = sorted(entry[0] * 1000 for entry in entries)
+        routes[label] = {
+            'requests': len(entries),
+            'errors': sum(1 for entry in entries if entry[2] >= 400),
+            'p50_ms': round(percentile(latencies, 50), 2),
+            'p95_ms': round(percentile(latencies, 95), 2),
+            'p99_ms': round(percentile(latencies, 99), 2),
+            'mean_ms': round(sum(latencies) / len(latencies), 2),
+            'throughput_rps': round(len(entries) / elapsed, 2),
+            'sql_per_request': round(sum(entry[1] for entry in entries) / len(entries), 2),
+        }
+    total = sum(route['requests'] for route in routes.values())
+    return {'duration_s': round(elapsed, 2), 'requests': total,
+            'throughput_rps': round(total / elapsed, 2), 'routes': routes}
+
+
+def print_report(results):
+    print(f"{'route':<22} {'reqs':>6} {'err':>4} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>8} {'sql/req':>8}")
+    print("-" * 80)
+    for label, route in results['routes'].items():
+        print(f"{label:<22} {route['requests']:>6} {route['errors']:>4} {route['p50_ms']:>8.1f} "
+              f"{route['p95_ms']:>8.1f} {route['p99_ms']:>8.1f} {route['throughput_rps']:>8.1f} "
+              f"{route['sql_per_request']:>8.1f}")
+    print("-" * 80)
+    print(f"{results['requests']} requests in {results['duration_s']}s "
+          f"({results['throughput_rps']} req/s)")
+
+
+def compare(results, baseline_path, threshold):
+    """Print p95 and SQL changes against a saved run; returns False on a regression"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+
+    ok = True
+    print(f"Compared with {baseline_path}:")
+    for label, route in results['routes'].items():
+        before = baseline['routes'].get(label)
+        if not before:
+            continue
+        change = (route['p95_ms'] - before['p95_ms']) / before['p95_ms'] if before['p95_ms'] else 0.0
+        # Cache hits make the SQL average wobble slightly between runs
+        regressed = change > threshold or route['sql_per_request'] > before['sql_per_request'] + 0.5
+        ok = ok and not regressed
+        print(f"{'✗' if regressed else '✓'} {label:<22} p95 {before['p95_ms']:>8.1f} -> {route['p95_ms']:>8.1f} ms "
+              f"({change:+.0%})  sql {before['sql_per_request']:.1f} -> {route['sql_per_request']:.1f}")
+    return ok
+
+
+def run(args, scratch):
+    """Seed a database in scratch, drive the routes and return the summarized results"""
+    # The app reads its configuration at import time
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(scratch, 'bench.db')
+    os.environ['CART_DB_PATH'] = os.path.join(scratch, 'carts.db')
+    os.environ['APP_ENV'] = args.profile
+    # Keep request and slow-request log lines out of the report
+    os.environ.setdefault('LOG_LEVEL', 'ERROR')
+
+    from app import app, db
+    from migrations import upgrade
+
+    with app.app_context():
+        upgrade(db)
+        data = seed(db, args)
+        engine = db.engine
+
+    recorder = Recorder(engine)
+    rng = random.Random(args.seed)
+    # Every role is represented at least once, the rest follow ROLE_WEIGHTS
+    roles = list(ROLE_WEIGHTS)[:args.users]
+    roles += rng.choices(list(ROLE_WEIGHTS), weights=list(ROLE_WEIGHTS.values()),
+                         k=max(0, args.users - len(roles)))
+    owners = list(data['owners'])
+    clients = []
+    for role in roles:
+        user_id = {'customer': lambda: rng.choice(data['customers']),
+                   'restaurant': lambda: rng.choice(owners),
+                   'admin': lambda: data['admin_id']}[role]()
+        clients.append((role, make_client(app, user_id), random.Random(rng.random())))
+
+    def simulate(role, client, user_rng, iterations):
+        for _ in range(iterations):
+            SESSIONS[role](recorder, client, user_rng, data)
+
+    # Notification and debug output would swamp the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        # One session per role warms the caches before anything is measured
+        for role, session in SESSIONS.items():
+            warm = next((c for r, c, _ in clients if r == role), None)
+            if warm:
+                session(recorder, warm, random.Random(0), data)
+        recorder.samples.clear()
+
+        threads = [threading.Thread(target=simulate, args=(role, client, user_rng, args.iterations))
+                   for role, client, user_rng in clients]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+    results = summarize(recorder.samples, elapsed)
+    results['config'] = {key: value for key, value in vars(args).items()
+                         if key not in ('output', 'compare', 'threshold')}
+    results['roles'] = {role: roles.count(role) for role in ROLE_WEIGHTS}
+    results['finished_at'] = datetime.utcnow().isoformat()
+
+    print(f"{args.users} users ({', '.join(f'{n} {r}' for r, n in results['roles'].items())}) "
+          f"x {args.iterations} sessions")
+    print_report(results)
+    engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--restaurants', type=int, default=10)
+    parser.add_argument('--items', type=int, default=30, help='menu items per restaurant')
+    parser.add_argument('--customers', type=int, default=200)
+    parser.add_argument('--orders', type=int, default=20, help='past orders per customer')
+    parser.add_argument('--users', type=int, default=16, help='concurrent simulated users')
+    parser.add_argument('--iterations', type=int, default=20, help='sessions per simulated user')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--profile', default='development', help='APP_ENV config profile')
+    parser.add_argument('--output', help='where to save the JSON results (default: bench_routes_<time>.json)')
+    parser.add_argument('--compare', help='results JSON of an earlier run')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed p95 slowdown before failing')
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix='bench_routes_')
+    try:
+        results = run(args, scratch)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    output = args.output or f"bench_routes_{datetime.utcnow():%Y%m%d_%H%M%S}.json"
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"✓ Results saved to {output}")
+
+    if args.compare and not compare(results, args.compare, args.threshold):
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
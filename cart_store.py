@@ -0,0 +1,251 @@
+"""
+Server-side shopping carts.
+
+Carts are keyed by user id and stored as {menu_item_id: quantity} with
+integer keys, so the session cookie no longer carries (and re-signs) the
+cart on every request. Every write pushes the cart's expiry forward by the
+TTL; expired carts read as empty and are deleted by purge_expired(), which
+start_expiry() runs on a schedule. The app starts the schedule in each
+process on its first request.
+
+MemoryCartStore suits a single process; SQLiteCartStore shares carts between
+worker processes through a small SQLite file of its own.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+
+logger = logging.getLogger(__name__)
+
+
+class CartStore(ABC):
+    """Interface shared by the cart stores"""
+
+    def __init__(self, ttl=7 * 24 * 60 * 60, clock=time.time):
+        self.ttl = ttl
+        self._clock = clock
+        self._expiry_thread = None
+        self._expiry_pid = None
+        self._expiry_lock = threading.Lock()
+        self._stop = threading.Event()
+
+    @abstractmethod
+    def get(self, user_id):
+        """Return the user's cart as {item_id: quantity}"""
+
+    @abstractmethod
+    def add(self, user_id, item_id, quantity):
+        """Atomically add quantity to an item; returns the new quantity"""
+
+    @abstractmethod
+    def set(self, user_id, item_id, quantity):
+        """Set an item's quantity, removing it when quantity <= 0"""
+
+    @abstractmethod
+    def clear(self, user_id):
+        """Empty the user's cart"""
+
+    @abstractmethod
+    def purge_expired(self):
+        """Delete expired carts; returns how many were removed"""
+
+    def start_expiry(self, interval=3600):
+        """Run purge_expired every interval seconds on a daemon thread
+
+        Starts once per process; a forked child that inherited a started
+        store gets its own thread on its first call.
+        """
+        if self._expiry_pid == os.getpid():
+            return
+        with self._expiry_lock:
+            if self._expiry_pid == os.getpid():
+                return
+            self._stop.clear()
+
+            def run():
+                while not self._stop.wait(interval):
+                    try:
+                        self.purge_expired()
+                    except Exception:
+                        logger.exception("Cart expiry failed", extra={'event': 'cart.expiry_failed'})
+
+            self._expiry_thread = threading.Thread(target=run, name='cart-expiry', daemon=True)
+            self._expiry_thread.start()
+            self._expiry_pid = os.getpid()
+
+    def stop_expiry(self):
+        with self._expiry_lock:
+            self._stop.set()
+            if self._expiry_thread is not None and self._expiry_pid == os.getpid():
+                self._expiry_thread.join()
+            self._expiry_thread = None
+            self._expiry_pid = None
+
+
+class MemoryCartStore(CartStore):
+    """Carts in a dict guarded by a lock; not shared between processes"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._lock = threading.Lock()
+        self._carts = {}  # user_id -> (expires_at, {item_id: quantity})
+
+    def _live_items(self, user_id, now):
+        entry = self._carts.get(user_id)
+        if entry is None or entry[0] <= now:
+            return {}
+        return entry[1]
+
+    def get(self, user_id):
+        with self._lock:
+            return dict(self._live_items(user_id, self._clock()))
+
+    def add(self, user_id, item_id, quantity):
+        with self._lock:
+            now = self._clock()
+            items = self._live_items(user_id, now)
+            items[item_id] = items.get(item_id, 0) + quantity
+            self._carts[user_id] = (now + self.ttl, items)
+            return items[item_id]
+
+    def set(self, user_id, item_id, quantity):
+        with self._lock:
+            now = self._clock()
+            items = self._live_items(user_id, now)
+            if quantity > 0:
+                items[item_id] = quantity
+            else:
+                items.pop(item_id, None)
+            self._carts[user_id] = (now + self.ttl, items)
+
+    def clear(self, user_id):
+        with self._lock:
+            self._carts.pop(user_id, None)
+
+    def purge_expired(self):
+        with self._lock:
+            now = self._clock()
+            expired = [user_id for user_id, (expires_at, _) in self._carts.items() if expires_at <= now]
+            for user_id in expired:
+                del self._carts[user_id]
+            return len(expired)
+
+
+class SQLiteCartStore(CartStore):
+    """Carts in a separate SQLite database, one row per cart line"""
+
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS cart ('
+        ' user_id INTEGER PRIMARY KEY, expires_at REAL NOT NULL)',
+        'CREATE INDEX IF NOT EXISTS ix_cart_expires_at ON cart (expires_at)',
+        'CREATE TABLE IF NOT EXISTS cart_line ('
+        ' user_id INTEGER NOT NULL, item_id INTEGER NOT NULL, quantity INTEGER NOT NULL,'
+        ' PRIMARY KEY (user_id, item_id)) WITHOUT ROWID',
+    )
+
+    def __init__(self, path, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self._local = threading.local()
+        connection = self._connection()
+        for statement in self.SCHEMA:
+            connection.execute(statement)
+
+    def _connection(self):
+        """One connection per thread, in autocommit mode with explicit transactions"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    def _write(self, user_id, statement, parameters):
+        """Run one cart-line write and refresh the cart's expiry atomically"""
+        now = self._clock()
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            # Lines of an expired cart that has not been purged yet start over
+            connection.execute(
+                'DELETE FROM cart_line WHERE user_id = ? AND EXISTS '
+                '(SELECT 1 FROM cart WHERE user_id = ? AND expires_at <= ?)',
+                (user_id, user_id, now))
+            row = connection.execute(statement, parameters).fetchone()
+            connection.execute(
+                'INSERT INTO cart (user_id, expires_at) VALUES (?, ?) '
+                'ON CONFLICT (user_id) DO UPDATE SET expires_at = excluded.expires_at',
+                (user_id, now + self.ttl))
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return row
+
+    def get(self, user_id):
+        rows = self._connection().execute(
+            'SELECT cart_line.item_id, cart_line.quantity FROM cart_line '
+            'JOIN cart ON cart.user_id = cart_line.user_id '
+            'WHERE cart_line.user_id = ? AND cart.expires_at > ?',
+            (user_id, self._clock()))
+        return dict(rows)
+
+    def add(self, user_id, item_id, quantity):
+        row = self._write(
+            user_id,
+            'INSERT INTO cart_line (user_id, item_id, quantity) VALUES (?, ?, ?) '
+            'ON CONFLICT (user_id, item_id) DO UPDATE SET quantity = quantity + excluded.quantity '
+            'RETURNING quantity',
+            (user_id, item_id, quantity))
+        return row[0]
+
+    def set(self, user_id, item_id, quantity):
+        if quantity > 0:
+            self._write(
+                user_id,
+                'INSERT INTO cart_line (user_id, item_id, quantity) VALUES (?, ?, ?) '
+                'ON CONFLICT (user_id, item_id) DO UPDATE SET quantity = excluded.quantity',
+                (user_id, item_id, quantity))
+        else:
+            self._write(user_id, 'DELETE FROM cart_line WHERE user_id = ? AND item_id = ?',
+                        (user_id, item_id))
+
+    def clear(self, user_id):
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.execute('DELETE FROM cart_line WHERE user_id = ?', (user_id,))
+            connection.execute('DELETE FROM cart WHERE user_id = ?', (user_id,))
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+
+    def purge_expired(self):
+        now = self._clock()
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.execute(
+                'DELETE FROM cart_line WHERE user_id IN '
+                '(SELECT user_id FROM cart WHERE expires_at <= ?)', (now,))
+            removed = connection.execute('DELETE FROM cart WHERE expires_at <= ?', (now,)).rowcount
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return removed
+
+
+def create_cart_store(kind, path=None, ttl=7 * 24 * 60 * 60):
+    """Build the store named by the CART_STORE setting"""
+    if kind == 'memory':
+        return MemoryCartStore(ttl=ttl)
+    if kind == 'sqlite':
+        return SQLiteCartStore(path, ttl=ttl)
+    raise ValueError(f"Unknown cart store: {kind}")
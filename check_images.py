@@ -1,36 +1,222 @@
 #!/usr/bin/env python3
 """
 Script to check image paths in database and verify if images exist
+
+Walks static/uploads and collects every image path the menu items reference
+(originals and their resized variants). Both run at once. Then it reports:
+
+  missing   referenced by a menu item but not on disk
+  corrupt   on disk but not a readable image (fails Pillow verify)
+  orphaned  on disk but not referenced by any menu item
+
+Each file's size, mtime and SHA-256 are kept in a manifest, so later runs
+only hash and verify the files that changed. The manifest also records when
+each file was first seen orphaned. --gc deletes orphans that have been
+unreferenced, and unmodified, for longer than the grace period. That way a
+file saved just before its menu item is committed is never removed.
+
+Usage:
+    python check_images.py                        # report
+    python check_images.py --gc                   # also delete orphans older than 72 hours
+    python check_images.py --gc --grace-hours 24 --dry-run
 """
 
+import argparse
+import hashlib
+import json
+import multiprocessing
 import os
-from app import app, db, MenuItem
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
-def check_images():
-    """Check image paths in database and verify if images exist"""
+from PIL import Image
+
+DEFAULT_MANIFEST = os.path.join('instance', 'upload_manifest.json')
+MANIFEST_VERSION = 1
+
+
+def walk_uploads(static_folder, upload_dir='uploads'):
+    """Return {path relative to static/: (size, mtime_ns)} for every file under uploads/"""
+    files = {}
+    pending = [os.path.join(static_folder, upload_dir)]
+    while pending:
+        directory = pending.pop()
+        try:
+            entries = list(os.scandir(directory))
+        except FileNotFoundError:
+            continue
+        for entry in entries:
+            # Dotfiles (.gitkeep) and in-progress writes are not uploads
+            if entry.name.startswith('.') or entry.name.endswith('.tmp'):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                pending.append(entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                stat = entry.stat(follow_symlinks=False)
+                path = os.path.relpath(entry.path, static_folder).replace(os.sep, '/')
+                files[path] = (stat.st_size, stat.st_mtime_ns)
+    return files
+
+
+def referenced_images(app, db, MenuItem):
+    """Return {image path: [menu item names]} for originals and variants"""
+    references = {}
     with app.app_context():
-        # Get all menu items
-        menu_items = MenuItem.query.all()
-        
-        print(f"Found {len(menu_items)} menu items")
-        print("-" * 50)
-        
-        for item in menu_items:
-            print(f"Item: {item.name}")
-            print(f"Image path: {item.image}")
-            
-            if item.image:
-                # Check if image file exists
-                full_path = os.path.join('static', item.image)
-                if os.path.exists(full_path):
-                    print(f"✓ Image exists: {full_path}")
-                else:
-                    print(f"✗ Image missing: {full_path}")
-            else:
-                print("✗ No image path in database")
-            
-            print("-" * 30)
+        rows = db.session.execute(
+            db.select(MenuItem.name, MenuItem.image, MenuItem.image_variants)
+            .where(MenuItem.image.isnot(None)).execution_options(yield_per=1000))
+        for name, image, variants in rows:
+            references.setdefault(image, []).append(name)
+            for paths in (variants or {}).values():
+                for path in paths.values():
+                    references.setdefault(path, []).append(name)
+    return references
+
+
+def inspect_file(static_folder, path):
+    """Hash a file and verify it decodes as an image (runs in a worker process)"""
+    full_path = os.path.join(static_folder, path)
+    digest = hashlib.sha256()
+    with open(full_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    error = None
+    try:
+        with Image.open(full_path) as img:
+            img.verify()
+    except Exception as e:
+        error = str(e) or type(e).__name__
+    return path, digest.hexdigest(), error
+
+
+def load_manifest(path):
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+    if manifest.get('version') != MANIFEST_VERSION:
+        return {}
+    return manifest.get('files', {})
+
+
+def save_manifest(path, files):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w') as f:
+        json.dump({'version': MANIFEST_VERSION, 'files': files}, f, indent=1, sort_keys=True)
+    os.replace(temp_path, path)
+
+
+def scan(static_folder, manifest_path, references_loader, workers=None, now=None):
+    """Bring the manifest up to date; returns (manifest files, references, files re-checked)"""
+    now = now or time.time()
+    previous = load_manifest(manifest_path)
+
+    # The directory walk and the database read don't depend on each other
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        walk = pool.submit(walk_uploads, static_folder)
+        load = pool.submit(references_loader)
+        on_disk, references = walk.result(), load.result()
+
+    files = {}
+    changed = []
+    for path, (size, mtime_ns) in on_disk.items():
+        entry = previous.get(path)
+        if entry and entry['size'] == size and entry['mtime_ns'] == mtime_ns:
+            files[path] = entry
+        else:
+            files[path] = {'size': size, 'mtime_ns': mtime_ns}
+            changed.append(path)
+
+    if changed:
+        # Spawned, not forked: importing app has already started the logging thread
+        with ProcessPoolExecutor(max_workers=workers,
+                                 mp_context=multiprocessing.get_context('spawn')) as pool:
+            for path, sha256, error in pool.map(inspect_file, [static_folder] * len(changed), changed,
+                                                 chunksize=16):
+                files[path].update(sha256=sha256, error=error)
+
+    for path, entry in files.items():
+        if path in references:
+            entry.pop('orphaned_since', None)
+        else:
+            entry.setdefault('orphaned_since', now)
+
+    save_manifest(manifest_path, files)
+    return files, references, len(changed)
+
+
+def collect_garbage(static_folder, manifest_path, files, grace_seconds, dry_run=False, now=None):
+    """Delete orphans unreferenced and unmodified for grace_seconds; returns the deleted paths"""
+    now = now or time.time()
+    deleted = []
+    for path, entry in sorted(files.items()):
+        orphaned_since = entry.get('orphaned_since')
+        if orphaned_since is None or now - orphaned_since < grace_seconds:
+            continue
+        if now - entry['mtime_ns'] / 1e9 < grace_seconds:
+            continue
+        if not dry_run:
+            try:
+                os.remove(os.path.join(static_folder, path))
+            except FileNotFoundError:
+                pass
+        deleted.append(path)
+
+    if deleted and not dry_run:
+        for path in deleted:
+            files.pop(path, None)
+        save_manifest(manifest_path, files)
+    return deleted
+
+
+def check_images(manifest_path=DEFAULT_MANIFEST, workers=None, gc=False, grace_hours=72, dry_run=False):
+    """Check image paths in database and verify if images exist"""
+    from app import app, db, MenuItem
+
+    start = time.perf_counter()
+    files, references, rechecked = scan(app.static_folder, manifest_path,
+                                        lambda: referenced_images(app, db, MenuItem), workers=workers)
+
+    missing = sorted(path for path in references if path not in files)
+    corrupt = sorted(path for path, entry in files.items() if entry.get('error'))
+    orphaned = sorted(path for path, entry in files.items() if 'orphaned_since' in entry)
+
+    print(f"Scanned {len(files)} files ({rechecked} new or changed) and {len(references)} "
+          f"referenced images in {time.perf_counter() - start:.1f}s")
+    print("-" * 50)
+    for path in missing:
+        print(f"✗ Missing: {path} (used by {', '.join(references[path])})")
+    for path in corrupt:
+        print(f"✗ Corrupt: {path}: {files[path]['error']}")
+    for path in orphaned:
+        age = (time.time() - files[path]['orphaned_since']) / 3600
+        print(f"  Orphaned: {path} (unreferenced for {age:.1f} h)")
+    print(f"{len(missing)} missing, {len(corrupt)} corrupt, {len(orphaned)} orphaned")
+
+    if gc:
+        deleted = collect_garbage(app.static_folder, manifest_path, files, grace_hours * 3600, dry_run)
+        verb = 'Would delete' if dry_run else 'Deleted'
+        for path in deleted:
+            print(f"  {verb} {path}")
+        print(f"{verb} {len(deleted)} orphaned files older than {grace_hours} hours")
+
+    if not missing and not corrupt:
+        print("✓ All referenced images are present and readable")
+        return True
+    return False
+
 
 if __name__ == '__main__':
-    check_images()
+    parser = argparse.ArgumentParser(description='Check uploaded images against the menu and clean up orphans.')
+    parser.add_argument('--manifest', default=DEFAULT_MANIFEST, help='manifest of already-checked files')
+    parser.add_argument('--workers', type=int, default=None, help='hashing processes (default: CPU count)')
+    parser.add_argument('--gc', action='store_true', help='delete orphans older than the grace period')
+    parser.add_argument('--grace-hours', type=float, default=72, help='how long an orphan is kept')
+    parser.add_argument('--dry-run', action='store_true', help='list what --gc would delete')
+    args = parser.parse_args()
 
+    ok = check_images(args.manifest, args.workers, args.gc, args.grace_hours, args.dry_run)
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Query-plan check for the hot routes.
+
+Drives each read-only hot route through the test client, captures the SQL it
+issues and asks the database for the plan of every SELECT. Exits non-zero if
+a statement falls back to a full scan of one of the large tables or of a
+whole index on one. Run it after `python migrations.py` against a database
+with sample data; carts go to a throwaway in-memory store, not the real one.
+"""
+
+import sys
+
+from sqlalchemy import event
+
+import app as application
+from app import app, db, User, Order, Restaurant
+from cart_store import MemoryCartStore
+
+# Tables that grow with traffic and must never be scanned on a hot route
+LARGE_TABLES = {'order', 'order_item', 'menu_item', 'user', 'email_outbox'}
+
+# Whole-table reads that are intended, per route
+ALLOWED_SCANS = {
+    # Order counts per item for sort=popular, read only when the menu index is rebuilt
+    '/menu': {'order_item'},
+    # Total revenue and the user count are aggregates over every row
+    '/admin_dashboard': {'order', 'user'},
+}
+
+
+def is_full_scan(plan_line, dialect):
+    """Return the table name if the plan line reads a whole table or a whole index"""
+    if dialect == 'sqlite':
+        # "SCAN order", "SCAN order USING [COVERING] INDEX ..." all read every
+        # row; only "SEARCH order USING ..." narrows by the index
+        words = plan_line.split()
+        if len(words) >= 2 and words[0] == 'SCAN':
+            return words[1].strip('"')
+    elif 'Seq Scan on' in plan_line:
+        return plan_line.split('Seq Scan on', 1)[1].split()[0].strip('"')
+    return None
+
+
+def is_bounded_scan(statement, plan):
+    """A LIMIT query read in index/rowid order without a sort stops after one page"""
+    return 'LIMIT' in statement.upper() and not any('TEMP B-TREE' in line or 'Sort' in line
+                                                    for line in plan)
+
+
+def explain(connection, statement, parameters):
+    dialect = connection.dialect.name
+    prefix = 'EXPLAIN QUERY PLAN ' if dialect == 'sqlite' else 'EXPLAIN '
+    rows = connection.exec_driver_sql(prefix + statement, parameters).fetchall()
+    # SQLite returns (id, parent, notused, detail); Postgres returns one text column
+    return [row[-1] for row in rows]
+
+
+def login_as(client, user):
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(user.id)
+        sess['_fresh'] = True
+
+
+def hot_requests():
+    """Yield (client, path) pairs covering the read-only hot routes"""
+    customer = User.query.filter_by(user_type='customer').first()
+    owner = User.query.filter_by(user_type='restaurant').first()
+    admin = User.query.filter_by(user_type='admin').first()
+
+    anonymous = app.test_client()
+    yield anonymous, '/menu'
+    yield anonymous, '/menu/items?sort=price-low&min_price=1&max_price=20'
+
+    if customer:
+        client = app.test_client()
+        login_as(client, customer)
+        application.cart_store.set(customer.id, 1, 1)
+        application.cart_store.set(customer.id, 2, 2)
+        yield client, '/cart'
+        yield client, '/checkout'
+        yield client, '/order_history'
+        order = Order.query.filter_by(user_id=customer.id).first()
+        if order:
+            yield client, f'/order_details/{order.id}'
+
+    if owner and Restaurant.query.filter_by(user_id=owner.id).first():
+        client = app.test_client()
+        login_as(client, owner)
+        yield client, '/restaurant_dashboard'
+        yield client, '/restaurant/orders?status=pending'
+
+    if admin:
+        client = app.test_client()
+        login_as(client, admin)
+        yield client, '/admin_dashboard'
+        yield client, '/admin/orders?status=pending'
+
+
+def check_query_plans():
+    failures = []
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT') and not executemany:
+            captured.append((statement, parameters))
+
+    # The routes read and write the module's cart_store; keep real carts out of it
+    real_carts, application.cart_store = application.cart_store, MemoryCartStore()
+    with app.app_context():
+        engine = db.engine
+        dialect = engine.dialect.name
+        requests = list(hot_requests())
+
+    event.listen(engine, 'before_cursor_execute', capture)
+    try:
+        for client, path in requests:
+            captured.clear()
+            response = client.get(path)
+            route = path.split('?')[0]
+            route = '/order_details' if route.startswith('/order_details/') else route
+            allowed = ALLOWED_SCANS.get(route, set())
+            statements = list(captured)
+
+            with engine.connect() as connection:
+                for statement, parameters in statements:
+                    plan = explain(connection, statement, parameters)
+                    if is_bounded_scan(statement, plan):
+                        continue
+                    for line in plan:
+                        table = is_full_scan(line, dialect)
+                        if table in LARGE_TABLES and table not in allowed:
+                            failures.append((path, line, statement))
+
+            print(f"{response.status_code}  {len(statements):>3} queries  {path}")
+    finally:
+        event.remove(engine, 'before_cursor_execute', capture)
+        application.cart_store = real_carts
+
+    if failures:
+        print("-" * 50)
+        for path, line, statement in failures:
+            print(f"✗ Full table scan on {path}: {line}")
+            print(f"  {' '.join(statement.split())[:200]}")
+        return False
+
+    print("✓ No full table scans on hot routes")
+    return True
+
+
+if __name__ == '__main__':
+    sys.exit(0 if check_query_plans() else 1)
@@ -3,18 +3,121 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+def database_url():
+    """DATABASE_URL with the legacy postgres:// scheme rewritten for SQLAlchemy"""
+    url = os.environ.get('DATABASE_URL') or 'sqlite:///restaurant_ordering.db'
+    if url.startswith('postgres://'):
+        url = 'postgresql://' + url[len('postgres://'):]
+    return url
+
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
-    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///restaurant_ordering.db'
+    SQLALCHEMY_DATABASE_URI = database_url()
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # Applied to every new SQLite connection; ignored for other databases
+    SQLITE_PRAGMAS = {}
+    
     # Email configuration
     MAIL_SERVER = os.environ.get('MAIL_SERVER') or 'smtp.gmail.com'
     MAIL_PORT = int(os.environ.get('MAIL_PORT') or 587)
     MAIL_USE_TLS = os.environ.get('MAIL_USE_TLS', 'True').lower() in ['true', 'on', '1']
     MAIL_USERNAME = os.environ.get('MAIL_USERNAME')
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
+    MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER') or MAIL_USERNAME
+    
+    # Email outbox delivery
+    OUTBOX_WORKERS = int(os.environ.get('OUTBOX_WORKERS') or 2)
+    OUTBOX_BATCH_SIZE = int(os.environ.get('OUTBOX_BATCH_SIZE') or 20)
+    OUTBOX_MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS') or 5)
+    OUTBOX_BACKOFF_SECONDS = int(os.environ.get('OUTBOX_BACKOFF_SECONDS') or 30)
+    OUTBOX_POLL_INTERVAL = float(os.environ.get('OUTBOX_POLL_INTERVAL') or 2.0)
+    # Start the workers in every web process; turn off when `flask outbox-worker` runs separately
+    OUTBOX_AUTOSTART = os.environ.get('OUTBOX_AUTOSTART', 'True').lower() in ['true', 'on', '1']
+    
+    # Password hashing; hashes made with another scheme or other parameters
+    # are upgraded on the user's next successful login
+    PASSWORD_SCHEME = os.environ.get('PASSWORD_SCHEME') or 'bcrypt'
+    PASSWORD_SCHEME_PARAMS = {
+        'bcrypt': {'rounds': int(os.environ.get('PASSWORD_BCRYPT_ROUNDS') or 12)},
+        'pbkdf2': {'iterations': int(os.environ.get('PASSWORD_PBKDF2_ITERATIONS') or 600000)},
+        'scrypt': {'n': int(os.environ.get('PASSWORD_SCRYPT_N') or 32768)},
+    }
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS') or os.cpu_count() or 2)
+    PASSWORD_HASH_QUEUE = int(os.environ.get('PASSWORD_HASH_QUEUE') or 64)
+    PASSWORD_HASH_EXECUTOR = os.environ.get('PASSWORD_HASH_EXECUTOR') or 'thread'
+    
+    # load_user identity cache; the TTL bounds staleness across worker processes
+    USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE') or 1024)
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL') or 60)
+    
+    # Server-side carts: 'sqlite' (shared by worker processes) or 'memory'
+    CART_STORE = os.environ.get('CART_STORE') or 'sqlite'
+    CART_DB_PATH = os.environ.get('CART_DB_PATH')  # defaults to instance/carts.db
+    CART_TTL_SECONDS = int(os.environ.get('CART_TTL_SECONDS') or 7 * 24 * 60 * 60)
+    CART_PURGE_INTERVAL = int(os.environ.get('CART_PURGE_INTERVAL') or 3600)
+    
+    # Serialized details of delivered/cancelled orders, which no longer change
+    ORDER_DETAILS_CACHE_SIZE = int(os.environ.get('ORDER_DETAILS_CACHE_SIZE') or 2048)
+    ORDER_DETAILS_CACHE_TTL = int(os.environ.get('ORDER_DETAILS_CACHE_TTL') or 3600)
+    
+    # Request instrumentation; /metrics requires "Authorization: Bearer <token>" when set
+    SLOW_REQUEST_MS = int(os.environ.get('SLOW_REQUEST_MS') or 500)
+    SLOW_QUERY_MS = int(os.environ.get('SLOW_QUERY_MS') or 100)
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    SLOW_LOG_FILE = os.environ.get('SLOW_LOG_FILE')  # slow requests/queries also go to the main log
+    
+    # JSON-lines logs written by a background thread; LOG_FILE defaults to stdout
+    LOG_LEVEL = os.environ.get('LOG_LEVEL') or 'INFO'
+    LOG_FILE = os.environ.get('LOG_FILE')
+    LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE') or 10000)
+    # Fraction of each high-volume event that is logged
+    LOG_SAMPLE_RATES = {
+        'http.request': float(os.environ.get('LOG_REQUEST_SAMPLE_RATE') or 0.1),
+        'email.skipped': 0.01,
+    }
+    
+    # Live order updates. Each open stream holds a worker thread unless the app
+    # runs on gevent/eventlet workers, so keep SSE_MAX_STREAMS below the
+    # server's threads per process; streams end after SSE_MAX_STREAM_SECONDS
+    # and the browser reconnects
+    SSE_HEARTBEAT_SECONDS = int(os.environ.get('SSE_HEARTBEAT_SECONDS') or 15)
+    SSE_MAX_STREAMS = int(os.environ.get('SSE_MAX_STREAMS') or 20)
+    SSE_MAX_STREAM_SECONDS = int(os.environ.get('SSE_MAX_STREAM_SECONDS') or 300)
     
     # File upload settings
     UPLOAD_FOLDER = 'static/uploads'
-    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size 
\ No newline at end of file
+    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
+    IMAGE_VARIANT_WORKERS = int(os.environ.get('IMAGE_VARIANT_WORKERS') or 2)
+    
+    # Bulk menu import: rows per transaction, background image downloads
+    MENU_IMPORT_BATCH_SIZE = int(os.environ.get('MENU_IMPORT_BATCH_SIZE') or 200)
+    MENU_IMPORT_MAX_ROWS = int(os.environ.get('MENU_IMPORT_MAX_ROWS') or 5000)
+    MENU_IMPORT_MAX_IMAGE_URLS = int(os.environ.get('MENU_IMPORT_MAX_IMAGE_URLS') or 200)
+    MENU_IMPORT_IMAGE_WORKERS = int(os.environ.get('MENU_IMPORT_IMAGE_WORKERS') or 8)
+    MENU_IMPORT_IMAGE_TIMEOUT = int(os.environ.get('MENU_IMPORT_IMAGE_TIMEOUT') or 10)
+
+class ProductionConfig(Config):
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE') or 10),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW') or 20),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT') or 30),
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE') or 1800),
+        'pool_pre_ping': True,
+    }
+    
+    # WAL lets readers proceed during writes; with WAL, synchronous=NORMAL
+    # only fsyncs at checkpoints and still cannot corrupt the database
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT') or 5000),
+        'cache_size': -int(os.environ.get('SQLITE_CACHE_KB') or 64000),
+        'mmap_size': int(os.environ.get('SQLITE_MMAP_BYTES') or 268435456),
+        'temp_store': 'MEMORY',
+    }
+
+config_by_name = {
+    'development': Config,
+    'production': ProductionConfig,
+}
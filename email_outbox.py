@@ -0,0 +1,247 @@
+"""
+Background delivery for the email outbox.
+
+Notifications are written to the outbox table in the same transaction as the
+order change that caused them. A small pool of worker threads claims pending
+rows in batches and sends them over SMTP connections that each worker keeps
+open between batches. Failed sends are retried with exponential backoff and
+moved to the 'dead' state after too many attempts.
+
+The web app starts the pool in each process on its first request. With
+OUTBOX_AUTOSTART=false the web processes only write to the outbox, and a
+separate `flask outbox-worker` process delivers the mail.
+"""
+
+import logging
+import os
+import smtplib
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+
+from sqlalchemy import and_, or_, select, update
+
+from structured_logging import log_event
+
+logger = logging.getLogger(__name__)
+
+
+def build_message(sender, to_email, subject, body):
+    msg = MIMEMultipart()
+    msg['From'] = sender
+    msg['To'] = to_email
+    msg['Subject'] = subject
+    msg.attach(MIMEText(body, 'plain'))
+    return msg.as_string()
+
+
+class SMTPConnection:
+    """One reusable SMTP session, reopened lazily after errors or idling"""
+
+    def __init__(self, host, port, use_tls=True, username=None, password=None,
+                 timeout=30, idle_timeout=60):
+        self.host = host
+        self.port = port
+        self.use_tls = use_tls
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self._server = None
+        self._last_used = 0.0
+
+    def _connect(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.use_tls:
+            server.starttls()
+        if self.username and self.password:
+            server.login(self.username, self.password)
+        self._server = server
+
+    def send(self, sender, to_email, message):
+        if self._server is None:
+            self._connect()
+        try:
+            self._server.sendmail(sender, to_email, message)
+        except smtplib.SMTPServerDisconnected:
+            # The server dropped an idle connection; reconnect once
+            self.close()
+            self._connect()
+            self._server.sendmail(sender, to_email, message)
+        self._last_used = time.monotonic()
+
+    def close_if_idle(self):
+        if self._server is not None and time.monotonic() - self._last_used > self.idle_timeout:
+            self.close()
+
+    def close(self):
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except Exception:
+                pass
+            self._server = None
+
+
+class OutboxWorkerPool:
+    """Drains the outbox table with a fixed number of worker threads"""
+
+    def __init__(self, app, db, model, workers=2, batch_size=20, max_attempts=5,
+                 backoff_base=30, backoff_max=3600, poll_interval=2.0,
+                 lease_timeout=300, connection_factory=None):
+        self.app = app
+        self.db = db
+        self.model = model
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.poll_interval = poll_interval
+        self.lease_timeout = lease_timeout
+        self.connection_factory = connection_factory or self._default_connection
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._started_pid = None
+
+    def _default_connection(self):
+        config = self.app.config
+        return SMTPConnection(config['MAIL_SERVER'], config['MAIL_PORT'],
+                              use_tls=config.get('MAIL_USE_TLS', True),
+                              username=config.get('MAIL_USERNAME'),
+                              password=config.get('MAIL_PASSWORD'))
+
+    @property
+    def sender(self):
+        return self.app.config.get('MAIL_DEFAULT_SENDER') or self.app.config.get('MAIL_USERNAME')
+
+    @property
+    def running(self):
+        return self._started_pid == os.getpid()
+
+    def start(self):
+        """Start the worker threads once per process; later calls are no-ops
+
+        A process forked from one that had started the pool (a preloading
+        WSGI server) does not inherit its threads, so the pid is checked too.
+        """
+        if self.running:
+            return
+        with self._lock:
+            if self.running:
+                return
+            self._stopping.clear()
+            self._threads = []
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f'outbox-worker-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            self._started_pid = os.getpid()
+
+    def stop(self, timeout=10):
+        with self._lock:
+            self._stopping.set()
+            self._wakeup.set()
+            for thread in self._threads:
+                thread.join(timeout)
+            self._threads = []
+            self._started_pid = None
+
+    def wake(self):
+        """Signal the workers that new rows were committed"""
+        self._wakeup.set()
+
+    def _run(self):
+        connection = self.connection_factory()
+        try:
+            while not self._stopping.is_set():
+                try:
+                    sent = self.process_batch(connection)
+                except Exception:
+                    logger.exception("Outbox worker error", extra={'event': 'outbox.worker_error'})
+                    sent = 0
+                if sent:
+                    continue
+                connection.close_if_idle()
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+        finally:
+            connection.close()
+
+    def _claimable(self, now):
+        model = self.model
+        return or_(
+            and_(model.status == 'pending', model.next_attempt_at <= now),
+            # Rows left in 'sending' by a worker that died mid-batch
+            and_(model.status == 'sending',
+                 model.claimed_at < now - timedelta(seconds=self.lease_timeout)))
+
+    def claim_batch(self):
+        """Atomically claim up to batch_size due rows and return them"""
+        model = self.model
+        session = self.db.session
+        now = datetime.utcnow()
+        ids = session.execute(
+            select(model.id).where(self._claimable(now))
+            .order_by(model.id).limit(self.batch_size)).scalars().all()
+        if not ids:
+            session.rollback()
+            return []
+
+        token = uuid.uuid4().hex
+        session.execute(
+            update(model).where(model.id.in_(ids), self._claimable(now))
+            .values(status='sending', claimed_at=now, claim_token=token))
+        session.commit()
+        return model.query.filter_by(claim_token=token, status='sending').all()
+
+    def backoff(self, attempts):
+        return timedelta(seconds=min(self.backoff_base * 2 ** (attempts - 1), self.backoff_max))
+
+    def process_batch(self, connection):
+        """Send one claimed batch over connection; returns the number of rows handled"""
+        with self.app.app_context():
+            rows = self.claim_batch()
+            if not rows:
+                return 0
+
+            for row in rows:
+                try:
+                    connection.send(self.sender, row.to_email,
+                                    build_message(self.sender, row.to_email, row.subject, row.body))
+                except Exception as e:
+                    connection.close()
+                    row.attempts += 1
+                    row.last_error = str(e)[:1000]
+                    if row.attempts >= self.max_attempts:
+                        row.status = 'dead'
+                    else:
+                        row.status = 'pending'
+                        row.next_attempt_at = datetime.utcnow() + self.backoff(row.attempts)
+                    log_event(logger, 'email.send_failed', logging.WARNING, f"Email send failed: {e}",
+                              outbox_id=row.id, attempts=row.attempts, status=row.status)
+                else:
+                    row.status = 'sent'
+                    row.sent_at = datetime.utcnow()
+                row.claim_token = None
+
+            self.db.session.commit()
+            return len(rows)
+
+    def drain(self):
+        """Synchronously send everything that is currently due"""
+        connection = self.connection_factory()
+        try:
+            handled = 0
+            while True:
+                count = self.process_batch(connection)
+                if not count:
+                    return handled
+                handled += count
+        finally:
+            connection.close()
@@ -1,4 +1,4 @@
-from app import app, db, MenuItem
+from app import app, db, image_pipeline, MenuItem
 
 def fix_image_assignments():
     with app.app_context():
@@ -42,6 +42,8 @@ def fix_image_assignments():
                     item.image = 'uploads/dessert_16.jpg'
         
         db.session.commit()
+        # Wait for the variants the commit queued for the new images
+        image_pipeline.shutdown(wait=True)
         print("Images reassigned successfully!")
         
         # Print the assignments
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Synthetic data generator for sizing and load tests.
+
+Generates users, restaurants with categories and menu items, and years of
+orders whose timestamps follow lunch and dinner peaks, busier weekends and
+steady growth. Restaurant popularity is skewed so a few restaurants take most
+orders. Rows are streamed in chunks with core bulk inserts, one transaction
+per chunk, and the same seed and arguments always produce the same data
+(apart from password salts).
+
+Every generated account uses the --password password. Emails are numbered
+by user id: one admin (adminN@generated.local, admin1@generated.local after
+--reset), then restaurant owners ownerN@generated.local and customers
+customerN@generated.local. The admin's email is printed at the end.
+
+Ids are written explicitly; on PostgreSQL the id sequences are moved past
+them afterwards so the app's own inserts don't collide.
+
+Usage:
+    python generate_data.py --reset                      # small dataset
+    python generate_data.py --reset --users 1000000 --restaurants 2000 --orders 5000000
+"""
+
+import argparse
+import bisect
+import itertools
+import random
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import delete, func, insert, select
+
+from app import app, db, User, Restaurant, Category, MenuItem, Order, OrderItem, bump_menu_version
+from migrations import upgrade
+from passwords import DEFAULT_PARAMS, hash_password
+
+CATEGORY_NAMES = ['Pizza', 'Pasta', 'Salads', 'Beverages', 'Desserts']
+DISHES = {
+    'Pizza': ['Margherita', 'Pepperoni', 'Four Cheese', 'Veggie Supreme', 'BBQ Chicken', 'Hawaiian'],
+    'Pasta': ['Carbonara', 'Bolognese', 'Pesto Penne', 'Arrabbiata', 'Lasagna', 'Alfredo'],
+    'Salads': ['Caesar', 'Greek', 'Caprese', 'Garden', 'Cobb', 'Quinoa'],
+    'Beverages': ['Lemonade', 'Iced Tea', 'Cola', 'Espresso', 'Smoothie', 'Sparkling Water'],
+    'Desserts': ['Tiramisu', 'Cheesecake', 'Gelato', 'Brownie', 'Panna Cotta', 'Cannoli'],
+}
+VEGETARIAN_CATEGORIES = {'Salads', 'Beverages', 'Desserts'}
+STREETS = ['Main St', 'Oak Ave', 'Maple Dr', 'Cedar Ln', 'Park Rd', 'Lake View', 'Hill St', 'River Rd']
+
+# Relative order volume per hour of day (lunch and dinner peaks) and per weekday (Mon..Sun)
+HOURLY_WEIGHTS = [2, 1, 0.5, 0.3, 0.3, 0.5, 1.5, 3, 4, 4, 5, 12,
+                  18, 14, 7, 5, 6, 10, 17, 20, 16, 10, 6, 3]
+WEEKDAY_WEIGHTS = [0.9, 0.85, 0.9, 1.0, 1.25, 1.45, 1.3]
+
+# Order volume at the end of the period relative to the start
+GROWTH = 3.0
+ACTIVE_STATUSES = ['pending', 'confirmed', 'preparing', 'dispatched']
+
+# Fixed rather than today, so runs on different days generate the same data
+DEFAULT_END = '2025-12-31'
+
+
+def chunks(rows, size):
+    iterator = iter(rows)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def write(connection, model, rows, chunk_size, total):
+    """Insert rows in chunk_size batches, one transaction per batch, with progress"""
+    started = time.perf_counter()
+    written = 0
+    for chunk in chunks(rows, chunk_size):
+        with connection.begin():
+            connection.execute(insert(model), chunk)
+        written += len(chunk)
+        elapsed = time.perf_counter() - started
+        print(f"\r  {model.__tablename__:<12} {written:>12,} / {total:,}  "
+              f"({written / elapsed if elapsed else 0:,.0f} rows/s)", end='', flush=True)
+    print()
+    return written
+
+
+def next_id(connection, model):
+    value = connection.execute(select(func.max(model.id))).scalar()
+    connection.commit()
+    return (value or 0) + 1
+
+
+def sync_sequences(connection, models):
+    """Move PostgreSQL id sequences past the explicitly inserted ids"""
+    if connection.dialect.name != 'postgresql':
+        return
+    with connection.begin():
+        for model in models:
+            table = model.__table__
+            connection.execute(select(func.setval(func.pg_get_serial_sequence(f'"{table.name}"', 'id'),
+                                                  func.max(table.c.id))))
+
+
+def generate_users(rng, first_id, count, user_type, prefix, password_hash, created_at):
+    for n in range(count):
+        yield {
+            'id': first_id + n,
+            'name': f"{prefix.title()} {first_id + n}",
+            'email': f"{prefix}{first_id + n}@generated.local",
+            'phone': f"555-{rng.randrange(10000):04d}",
+            'address': f"{rng.randint(1, 9999)} {rng.choice(STREETS)}, City",
+            'password_hash': password_hash,
+            'user_type': user_type,
+            'created_at': created_at,
+        }
+
+
+def generate_menus(rng, restaurant_ids, first_category_id, first_item_id, items_per_restaurant):
+    """Return (categories, items, {restaurant_id: [(item_id, price)]})"""
+    categories, items, menus = [], [], {}
+    category_id, item_id = first_category_id, first_item_id
+    for restaurant_id in restaurant_ids:
+        ids = {}
+        for name in CATEGORY_NAMES:
+            categories.append({'id': category_id, 'name': name, 'restaurant_id': restaurant_id})
+            ids[name] = category_id
+            category_id += 1
+        menus[restaurant_id] = []
+        for n in range(items_per_restaurant):
+            category = CATEGORY_NAMES[n % len(CATEGORY_NAMES)]
+            dish = DISHES[category][(n // len(CATEGORY_NAMES)) % len(DISHES[category])]
+            price = round(rng.uniform(2.5, 8) if category == 'Beverages' else rng.uniform(6, 28), 2)
+            items.append({
+                'id': item_id, 'name': f"{dish} #{n + 1}" if n >= 30 else dish,
+                'description': f"House {dish.lower()} made fresh to order.",
+                'price': price, 'is_available': rng.random() > 0.03,
+                'is_vegetarian': category in VEGETARIAN_CATEGORIES or rng.random() < 0.25,
+                'category_id': ids[category], 'restaurant_id': restaurant_id,
+            })
+            menus[restaurant_id].append((item_id, price))
+            item_id += 1
+    return categories, items, menus
+
+
+def orders_per_day(total, start, days):
+    """Spread total orders over the days, weighted by weekday and growth"""
+    weights = [WEEKDAY_WEIGHTS[(start + timedelta(days=d)).weekday()] *
+               (1 + (GROWTH - 1) * d / max(days - 1, 1)) for d in range(days)]
+    scale = total / sum(weights)
+    counts, carry = [], 0.0
+    for weight in weights:
+        exact = weight * scale + carry
+        counts.append(int(exact))
+        carry = exact - int(exact)
+    counts[-1] += total - sum(counts)
+    return counts
+
+
+def generate_orders(rng, first_order_id, total, start, days, customer_ids, restaurant_ids, menus, now):
+    """Yield (order, [order items]) in created_at order"""
+    hours = list(range(24))
+    # Zipf-like popularity: the restaurant at rank k gets weight 1 / k^0.8
+    popularity = list(itertools.accumulate(1 / (rank ** 0.8) for rank in range(1, len(restaurant_ids) + 1)))
+    # A fifth of the customers place most of the orders
+    regulars = customer_ids[:max(1, len(customer_ids) // 5)]
+
+    order_id = first_order_id
+    for day, count in enumerate(orders_per_day(total, start, days)):
+        midnight = datetime.combine(start + timedelta(days=day), datetime.min.time())
+        offsets = sorted(timedelta(hours=hour, seconds=rng.randrange(3600))
+                         for hour in rng.choices(hours, weights=HOURLY_WEIGHTS, k=count))
+        for offset in offsets:
+            created_at = midnight + offset
+            restaurant_id = restaurant_ids[bisect.bisect(popularity, rng.random() * popularity[-1])]
+            menu = menus[restaurant_id]
+            lines, total_amount = [], 0.0
+            for menu_item_id, price in rng.sample(menu, min(len(menu), rng.choice((1, 1, 2, 2, 2, 3, 3, 4, 5)))):
+                quantity = rng.choice((1, 1, 1, 2, 2, 3))
+                total_amount += price * quantity
+                lines.append({'order_id': order_id, 'menu_item_id': menu_item_id,
+                              'quantity': quantity, 'price': price})
+
+            age = now - created_at
+            if age > timedelta(hours=2):
+                status = 'cancelled' if rng.random() < 0.05 else 'delivered'
+            else:
+                status = rng.choice(ACTIVE_STATUSES)
+
+            yield {
+                'id': order_id,
+                'user_id': rng.choice(regulars) if rng.random() < 0.7 else rng.choice(customer_ids),
+                'restaurant_id': restaurant_id,
+                'total_amount': round(total_amount, 2),
+                'status': status,
+                'delivery_address': f"{rng.randint(1, 9999)} {rng.choice(STREETS)}, City",
+                'created_at': created_at,
+            }, lines
+            order_id += 1
+
+
+def reset(connection):
+    """Delete all application data, keeping schema_version and menu_version"""
+    with connection.begin():
+        for table in reversed(db.metadata.sorted_tables):
+            if table.name != 'menu_version':
+                connection.execute(delete(table))
+
+
+def generate(args):
+    rng = random.Random(args.seed)
+    end = date.fromisoformat(args.end)
+    days = max(1, int(args.years * 365))
+    start = end - timedelta(days=days - 1)
+    now = datetime.combine(end, datetime.max.time())
+    # Every account exists from the first day of the order history
+    joined = datetime.combine(start, datetime.min.time())
+    # One hash shared by every account; hashing millions would take hours
+    scheme = app.config['PASSWORD_SCHEME']
+    password_hash = hash_password(args.password, scheme,
+                                  {**DEFAULT_PARAMS[scheme], **app.config['PASSWORD_SCHEME_PARAMS'].get(scheme, {})})
+
+    with app.app_context():
+        # A fresh database has no tables yet
+        upgrade(db)
+
+    with app.app_context(), db.engine.connect() as connection:
+        if connection.dialect.name == 'sqlite':
+            # Bulk load settings for this connection only
+            connection.exec_driver_sql('PRAGMA journal_mode=WAL')
+            connection.exec_driver_sql('PRAGMA synchronous=OFF')
+            connection.exec_driver_sql('PRAGMA cache_size=-200000')
+            connection.commit()
+        if args.reset:
+            reset(connection)
+            print("✓ Cleared existing data")
+
+        started = time.perf_counter()
+        user_id = next_id(connection, User)
+        write(connection, User, generate_users(rng, user_id, 1, 'admin', 'admin', password_hash, joined),
+              args.chunk_size, 1)
+
+        owner_first = user_id + 1
+        write(connection, User, generate_users(rng, owner_first, args.restaurants, 'restaurant', 'owner', password_hash, joined),
+              args.chunk_size, args.restaurants)
+        restaurant_first = next_id(connection, Restaurant)
+        restaurant_ids = list(range(restaurant_first, restaurant_first + args.restaurants))
+        write(connection, Restaurant, ({
+            'id': restaurant_id, 'name': f"Restaurant {restaurant_id}", 'contact': f"555-{rng.randrange(10000):04d}",
+            'location': f"{rng.randint(1, 9999)} {rng.choice(STREETS)}, City", 'user_id': owner_first + n,
+        } for n, restaurant_id in enumerate(restaurant_ids)), args.chunk_size, args.restaurants)
+
+        categories, items, menus = generate_menus(rng, restaurant_ids, next_id(connection, Category),
+                                                  next_id(connection, MenuItem), args.items)
+        write(connection, Category, categories, args.chunk_size, len(categories))
+        write(connection, MenuItem, items, args.chunk_size, len(items))
+
+        customer_first = owner_first + args.restaurants
+        write(connection, User, generate_users(rng, customer_first, args.users, 'customer', 'customer', password_hash, joined),
+              args.chunk_size, args.users)
+        customer_ids = list(range(customer_first, customer_first + args.users))
+
+        # Orders and their items go in together so each chunk is self-contained
+        order_started = time.perf_counter()
+        orders_written = lines_written = 0
+        stream = generate_orders(rng, next_id(connection, Order), args.orders, start, days,
+                                 customer_ids, restaurant_ids, menus, now)
+        for chunk in chunks(stream, args.chunk_size):
+            lines = [line for _, order_lines in chunk for line in order_lines]
+            with connection.begin():
+                connection.execute(insert(Order), [order for order, _ in chunk])
+                connection.execute(insert(OrderItem), lines)
+            orders_written += len(chunk)
+            lines_written += len(lines)
+            elapsed = time.perf_counter() - order_started
+            print(f"\r  {'order':<12} {orders_written:>12,} / {args.orders:,}  "
+                  f"({orders_written / elapsed:,.0f} orders/s, {lines_written:,} items)", end='', flush=True)
+        print()
+
+        sync_sequences(connection, [User, Restaurant, Category, MenuItem, Order, OrderItem])
+        # Menus changed underneath any running app, so drop their catalog caches
+        with connection.begin():
+            bump_menu_version(connection)
+
+        print(f"✓ Generated {args.users + args.restaurants + 1:,} users, {args.restaurants:,} restaurants, "
+              f"{len(items):,} items and {args.orders:,} orders ({start} to {end}) "
+              f"in {time.perf_counter() - started:.1f}s")
+        print(f"✓ Admin login: admin{user_id}@generated.local / {args.password}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--users', type=int, default=10000, help='customers')
+    parser.add_argument('--restaurants', type=int, default=50)
+    parser.add_argument('--items', type=int, default=30, help='menu items per restaurant')
+    parser.add_argument('--orders', type=int, default=100000)
+    parser.add_argument('--years', type=float, default=2.0, help='span of order history')
+    parser.add_argument('--end', default=DEFAULT_END,
+                        help=f'last day of order history, YYYY-MM-DD (default: {DEFAULT_END})')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--chunk-size', type=int, default=10000, help='rows per transaction')
+    parser.add_argument('--password', default='password123', help='password of every generated account')
+    parser.add_argument('--reset', action='store_true', help='delete existing data first')
+    generate(parser.parse_args())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+"""
+Background download of remote images into the uploads folder.
+
+Only http and https URLs are fetched, and only from public addresses: the
+host is resolved at connect time (for every redirect too) and loopback,
+private, link-local and reserved addresses are refused, so an imported URL
+cannot reach the server's own network. Proxy settings from the environment
+are ignored for the same reason.
+
+Bodies are size capped and must decode as an image before they are written.
+Saved files get a fresh name and are stored under the format Pillow
+detected, whatever extension the URL had. Failures are logged in full but
+reported to the caller as a short generic message.
+"""
+
+import http.client
+import io
+import ipaddress
+import logging
+import os
+import socket
+import threading
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from PIL import Image
+
+from structured_logging import log_event
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
+ALLOWED_SCHEMES = ('http', 'https')
+
+
+class ImageFetchError(Exception):
+    pass
+
+
+class BlockedAddress(ImageFetchError):
+    pass
+
+
+def is_remote(reference):
+    return urlparse(reference).scheme in ALLOWED_SCHEMES
+
+
+def is_public_address(address):
+    ip = ipaddress.ip_address(address)
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not (ip.is_multicast or ip.is_reserved or ip.is_loopback
+                                 or ip.is_link_local or ip.is_private)
+
+
+def resolve_public(host, port):
+    """Resolve host and return one of its addresses, refusing any non-public one"""
+    try:
+        infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except socket.gaierror as e:
+        raise ImageFetchError(f"Cannot resolve {host}: {e}")
+    addresses = [info[4][0] for info in infos]
+    # Every address must be public, or a later retry could land on a private one
+    blocked = [address for address in addresses if not is_public_address(address)]
+    if blocked or not addresses:
+        raise BlockedAddress(f"{host} resolves to a non-public address: {', '.join(blocked)}")
+    return addresses[0]
+
+
+def _create_public_connection(address, timeout=socket._GLOBAL_DEFAULT_TIMEOUT, source_address=None):
+    host, port = address
+    return socket.create_connection((resolve_public(host, port), port), timeout, source_address)
+
+
+class _PublicOnly:
+    """Connects to the address resolve_public() checked, not a fresh lookup"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._create_connection = _create_public_connection
+
+
+class _PublicHTTPConnection(_PublicOnly, http.client.HTTPConnection):
+    pass
+
+
+class _PublicHTTPSConnection(_PublicOnly, http.client.HTTPSConnection):
+    pass
+
+
+class _PublicHTTPHandler(urllib.request.HTTPHandler):
+    def http_open(self, req):
+        return self.do_open(_PublicHTTPConnection, req)
+
+
+class _PublicHTTPSHandler(urllib.request.HTTPSHandler):
+    def https_open(self, req):
+        return self.do_open(_PublicHTTPSConnection, req, context=self._context)
+
+
+def _build_opener(allow_private):
+    # No ProxyHandler, FileHandler or FTPHandler: a redirect to any other
+    # scheme fails with "unknown url type"
+    opener = urllib.request.OpenerDirector()
+    http_handlers = ((urllib.request.HTTPHandler(), urllib.request.HTTPSHandler()) if allow_private
+                     else (_PublicHTTPHandler(), _PublicHTTPSHandler()))
+    for handler in (*http_handlers, urllib.request.HTTPRedirectHandler(),
+                    urllib.request.HTTPDefaultErrorHandler(), urllib.request.HTTPErrorProcessor()):
+        opener.add_handler(handler)
+    return opener
+
+
+_public_opener = _build_opener(allow_private=False)
+_trusted_opener = _build_opener(allow_private=True)
+
+
+def download(url, timeout=10, max_bytes=16 * 1024 * 1024, allow_private=False):
+    """Return (body, extension) for an image URL, raising ImageFetchError
+
+    allow_private lifts the public-address check, for operator-run scripts
+    that fetch from a local mirror.
+    """
+    if not is_remote(url):
+        raise ImageFetchError("Only http and https image URLs are allowed")
+
+    opener = _trusted_opener if allow_private else _public_opener
+    request = urllib.request.Request(url, headers={'User-Agent': 'restaurant-ordering/1.0'})
+    try:
+        with opener.open(request, timeout=timeout) as response:
+            length = response.headers.get('Content-Length')
+            too_large = bool(length and length.isdigit() and int(length) > max_bytes)
+            body = b'' if too_large else response.read(max_bytes + 1)
+    except BlockedAddress as e:
+        log_event(logger, 'image.fetch_blocked', logging.WARNING, f"Image download refused: {e}", url=url)
+        raise ImageFetchError("Could not download the image")
+    except Exception as e:
+        log_event(logger, 'image.fetch_failed', logging.WARNING, f"Image download failed: {e}", url=url)
+        raise ImageFetchError("Could not download the image")
+    if too_large or len(body) > max_bytes:
+        raise ImageFetchError(f"Image larger than {max_bytes} bytes")
+
+    try:
+        with Image.open(io.BytesIO(body)) as img:
+            image_format = img.format
+            img.verify()
+    except Exception:
+        raise ImageFetchError("Not a valid image")
+    if image_format not in IMAGE_EXTENSIONS:
+        raise ImageFetchError(f"Unsupported image format: {image_format}")
+    return body, IMAGE_EXTENSIONS[image_format]
+
+
+class ImageFetcher:
+    """Downloads image URLs into upload_folder on a small background thread pool"""
+
+    def __init__(self, upload_folder, max_workers=8, timeout=10, max_bytes=16 * 1024 * 1024):
+        self.upload_folder = upload_folder
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def fetch(self, url):
+        """Download one URL; returns the path relative to static/, like save_image()"""
+        body, extension = download(url, self.timeout, self.max_bytes)
+        filename = f"{uuid.uuid4().hex}.{extension}"
+        with open(os.path.join(self.upload_folder, filename), 'wb') as f:
+            f.write(body)
+        return f"uploads/{filename}"
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix='image-fetch')
+            return self._executor
+
+    def submit(self, url, on_done):
+        """Queue one download; on_done(future) runs on the worker thread when it finishes"""
+        future = self._pool().submit(self.fetch, url)
+        future.add_done_callback(on_done)
+        return future
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Resized image variants for menu item uploads.
+
+Each upload is decoded once in a worker process and written out at fixed
+widths as JPEG and WebP, with EXIF orientation applied and all metadata
+stripped. Templates use the recorded variants to emit srcset so browsers
+download the smallest image that fits.
+
+Usage:
+    python image_variants.py    # generate variants for images that have none or stale ones
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageOps
+
+VARIANT_WIDTHS = (320, 640, 960)
+
+VARIANT_FORMATS = {
+    'jpeg': ('JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+}
+
+
+def generate_variants(static_folder, image, widths=VARIANT_WIDTHS):
+    """Write resized variants of static_folder/image; returns {format: {width: path}}.
+
+    Runs in a worker process, so it only touches the filesystem. Widths larger
+    than the original are skipped (the original width is used instead when
+    every requested width is larger).
+    """
+    source = os.path.join(static_folder, image)
+    directory, filename = os.path.split(image)
+    stem = os.path.splitext(filename)[0]
+    variant_dir = os.path.join(directory, 'variants')
+    os.makedirs(os.path.join(static_folder, variant_dir), exist_ok=True)
+
+    with Image.open(source) as img:
+        # Let the JPEG decoder downscale while decoding when it can
+        img.draft('RGB', (max(widths), max(widths)))
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ('RGB', 'RGBA'):
+            img = img.convert('RGBA' if 'transparency' in img.info else 'RGB')
+
+        targets = [w for w in widths if w <= img.width] or [img.width]
+        variants = {name: {} for name in VARIANT_FORMATS}
+        for width in targets:
+            height = max(1, round(img.height * width / img.width))
+            resized = img.resize((width, height), Image.Resampling.LANCZOS)
+
+            for name, (pil_format, extension, options) in VARIANT_FORMATS.items():
+                frame = resized
+                if pil_format == 'JPEG' and frame.mode == 'RGBA':
+                    background = Image.new('RGB', frame.size, (255, 255, 255))
+                    background.paste(frame, mask=frame.split()[3])
+                    frame = background
+                path = f"{variant_dir}/{stem}_{width}.{extension}"
+                # No exif= argument, so no metadata is carried over
+                frame.save(os.path.join(static_folder, path), pil_format, **options)
+                variants[name][str(width)] = path.replace(os.sep, '/')
+
+    return variants
+
+
+def variants_match(image, variants):
+    """True if every path in a variants dict was generated from image"""
+    directory, filename = os.path.split(image)
+    prefix = f"{directory}/variants/{os.path.splitext(filename)[0]}_".lstrip('/')
+    paths = [path for widths in (variants or {}).values() for path in widths.values()]
+    return bool(paths) and all(path.startswith(prefix) for path in paths)
+
+
+class ImageVariantPipeline:
+    """Runs generate_variants in a process pool, off the request path
+
+    The pool is created on the first submit and uses spawned, not forked,
+    workers: the web process is threaded, and a child forked while another
+    thread holds a lock (the logging queue, the database pool) can deadlock.
+    """
+
+    def __init__(self, static_folder, max_workers=2, widths=VARIANT_WIDTHS):
+        self.static_folder = static_folder
+        self.max_workers = max_workers
+        self.widths = widths
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                     mp_context=multiprocessing.get_context('spawn'))
+            return self._executor
+
+    def submit(self, image, on_done):
+        """Queue image for processing; on_done(future) runs in the parent process"""
+        future = self._pool().submit(generate_variants, self.static_folder, image, self.widths)
+        future.add_done_callback(on_done)
+        return future
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+if __name__ == '__main__':
+    from app import app, MenuItem, image_pipeline, queue_image_variants
+
+    with app.app_context():
+        # Also regenerates variants left over from an item's previous image
+        items = MenuItem.query.filter(MenuItem.image.isnot(None)).all()
+        pending = {}
+        for item in items:
+            if not variants_match(item.image, item.image_variants):
+                pending.setdefault(item.image, []).append(item.id)
+
+    print(f"Generating variants for {len(pending)} images...")
+    for image, item_ids in pending.items():
+        queue_image_variants(image, item_ids)
+    image_pipeline.shutdown(wait=True)
+    print("Done!")
@@ -0,0 +1,53 @@
+"""
+In-process cache for the menu catalog.
+
+The catalog is keyed by the menu version stored in the database, so every
+worker process serves the same snapshot and drops it as soon as any process
+(or script) writes to the menu.
+"""
+
+import threading
+
+
+class MenuCatalogCache:
+    """Holds the catalog snapshot for the most recent menu version"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._catalog = None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, version, loader):
+        """Return the catalog for version, calling loader() on a miss"""
+        with self._lock:
+            if self._catalog is not None and self._version == version:
+                self.hits += 1
+                return self._catalog
+            self.misses += 1
+
+        catalog = loader()
+
+        with self._lock:
+            # Never replace a newer snapshot loaded by a concurrent request
+            if self._version is None or version >= self._version:
+                self._version = version
+                self._catalog = catalog
+        return catalog
+
+    def clear(self):
+        with self._lock:
+            self._version = None
+            self._catalog = None
+
+    def stats(self):
+        """Return hit/miss counters for monitoring"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'version': self._version,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
@@ -0,0 +1,142 @@
+"""
+Row parsing and validation for bulk menu import/export.
+
+Imports are read row by row from the uploaded stream as CSV (with a header
+row) or JSON lines, one object per line, with the columns in MENU_COLUMNS:
+
+    name,description,price,category,is_vegetarian,is_available,image
+    Margherita,Tomato and mozzarella,9.5,Pizza,true,true,https://example.com/m.jpg
+
+name, price and category are required. image is an http(s) URL on a public
+host, downloaded in the background after the rows are saved, or an uploads/
+path that is already in static/ (as exported). Exports use the same columns,
+so an export can be imported into another restaurant.
+"""
+
+import csv
+import io
+import json
+import math
+
+MENU_COLUMNS = ('name', 'description', 'price', 'category', 'is_vegetarian', 'is_available', 'image')
+REQUIRED_COLUMNS = ('name', 'price', 'category')
+FORMATS = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+
+TRUE_VALUES = {'true', '1', 'yes', 'y', 'on'}
+FALSE_VALUES = {'false', '0', 'no', 'n', 'off', ''}
+
+
+class RowError(ValueError):
+    pass
+
+
+def detect_format(filename, content_type=None):
+    """'csv' or 'jsonl' from a file name or content type, else None"""
+    extension = (filename or '').rsplit('.', 1)[-1].lower()
+    if extension in ('csv', 'jsonl', 'ndjson'):
+        return 'jsonl' if extension == 'ndjson' else extension
+    for file_format, mimetype in FORMATS.items():
+        if content_type and content_type.startswith(mimetype):
+            return file_format
+    return None
+
+
+def read_rows(stream, file_format):
+    """Yield (line number, row dict or None, error or None) from a binary stream
+
+    Raises ValueError up front for an unknown format or a CSV header that
+    lacks a required column.
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', errors='replace', newline='')
+    if file_format == 'csv':
+        reader = csv.DictReader(text)
+        missing = [column for column in REQUIRED_COLUMNS if column not in (reader.fieldnames or ())]
+        if missing:
+            raise ValueError(f"CSV header is missing: {', '.join(missing)}")
+        return ((reader.line_num, row, None) for row in reader)
+    if file_format == 'jsonl':
+        return _read_json_lines(text)
+    raise ValueError(f"Unsupported format: {file_format}")
+
+
+def _read_json_lines(text):
+    for line_number, line in enumerate(text, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield line_number, None, 'Invalid JSON'
+            continue
+        if isinstance(row, dict):
+            yield line_number, row, None
+        else:
+            yield line_number, None, 'Each line must be a JSON object'
+
+
+def _text(row, column, max_length=None, required=False):
+    value = row.get(column)
+    value = '' if value is None else str(value).strip()
+    if required and not value:
+        raise RowError(f"{column} is required")
+    if max_length and len(value) > max_length:
+        raise RowError(f"{column} is longer than {max_length} characters")
+    return value
+
+
+def _flag(row, column, default):
+    value = row.get(column)
+    if value is None:
+        return default
+    if isinstance(value, bool):
+        return value
+    value = str(value).strip().lower()
+    if value == '':
+        return default
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise RowError(f"{column} must be true or false")
+
+
+def validate_row(row):
+    """Return the cleaned MenuItem values of one row, raising RowError"""
+    try:
+        price = float(row.get('price'))
+    except (TypeError, ValueError):
+        raise RowError("price must be a number")
+    if not math.isfinite(price) or price <= 0:
+        raise RowError("price must be greater than 0")
+
+    return {
+        'name': _text(row, 'name', 100, required=True),
+        'description': _text(row, 'description'),
+        'price': round(price, 2),
+        'category': _text(row, 'category', 50, required=True),
+        'is_vegetarian': _flag(row, 'is_vegetarian', False),
+        'is_available': _flag(row, 'is_available', True),
+        'image': _text(row, 'image', 2048) or None,
+    }
+
+
+def export_chunk(rows, file_format, header=False):
+    """Serialize menu rows (dicts keyed by MENU_COLUMNS) as one text chunk"""
+    if file_format == 'jsonl':
+        return ''.join(json.dumps({column: row[column] for column in MENU_COLUMNS}) + '\n'
+                       for row in rows)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(MENU_COLUMNS)
+    for row in rows:
+        writer.writerow([_csv_value(row[column]) for column in MENU_COLUMNS])
+    return buffer.getvalue()
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return value
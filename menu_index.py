@@ -0,0 +1,182 @@
+"""
+In-memory sorted indexes over the available menu items.
+
+Items are partitioned by (category_id, is_vegetarian) and each partition keeps
+lists sorted by price, by name and by popularity, so a filtered, sorted page
+is a bisect into a few lists plus a lazy merge instead of a scan of the
+catalog. Popularity is the number of orders that included the item, most
+first; it is loaded on rebuild and bumped by record_orders() as orders are
+placed in this process.
+"""
+
+import bisect
+import heapq
+import threading
+
+from pagination import decode_cursor, encode_cursor
+
+SORT_KEYS = ('name', 'price-low', 'price-high', 'popular')
+
+INDEXED_FIELDS = ('id', 'name', 'description', 'price', 'image', 'image_variants', 'is_available',
+                  'is_vegetarian', 'category_id', 'restaurant_id')
+
+
+def snapshot_item(item):
+    """Copy the indexed columns of a MenuItem into a plain dict"""
+    return {field: getattr(item, field) for field in INDEXED_FIELDS}
+
+
+def _iter_range(entries, lo, hi, descending):
+    """Lazily yield entries[lo:hi] without copying the slice"""
+    indexes = range(hi - 1, lo - 1, -1) if descending else range(lo, hi)
+    for i in indexes:
+        yield entries[i]
+
+
+class MenuIndex:
+    """Sorted, partitioned view of the available menu for one menu version"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.version = None
+        self._items = {}
+        self._popularity = {}  # item_id -> orders that included it
+        self._by_name = {}
+        self._by_price = {}
+        self._by_popularity = {}
+
+    @staticmethod
+    def _name_key(item):
+        return (item['name'].lower(), item['id'])
+
+    @staticmethod
+    def _price_key(item):
+        return (item['price'], item['id'])
+
+    def _popularity_key(self, item):
+        return (-self._popularity.get(item['id'], 0), item['id'])
+
+    @staticmethod
+    def _partition(item):
+        return (item['category_id'], bool(item['is_vegetarian']))
+
+    def _keys(self, item):
+        return ((self._by_name, self._name_key(item)),
+                (self._by_price, self._price_key(item)),
+                (self._by_popularity, self._popularity_key(item)))
+
+    def _insert(self, item):
+        part = self._partition(item)
+        self._items[item['id']] = item
+        for index, key in self._keys(item):
+            bisect.insort(index.setdefault(part, []), key)
+
+    def _remove(self, item_id):
+        item = self._items.pop(item_id, None)
+        if item is None:
+            return
+        part = self._partition(item)
+        for index, key in self._keys(item):
+            entries = index[part]
+            del entries[bisect.bisect_left(entries, key)]
+            if not entries:
+                del index[part]
+
+    def rebuild(self, version, items, popularity=None):
+        """Replace the whole index with the given item snapshots and {item_id: orders}"""
+        with self._lock:
+            self._items = {}
+            self._popularity = dict(popularity or {})
+            self._by_name = {}
+            self._by_price = {}
+            self._by_popularity = {}
+            for item in items:
+                if item['is_available']:
+                    self._insert(item)
+            self.version = version
+
+    def apply(self, from_version, to_version, upserts, removals):
+        """Apply item changes committed between two menu versions.
+
+        Returns False (and leaves the index untouched) when the index is not
+        at from_version, i.e. another process changed the menu in between and
+        the caller has to rebuild instead.
+        """
+        with self._lock:
+            if self.version != from_version:
+                return False
+            for item_id in removals:
+                self._remove(item_id)
+            for item in upserts:
+                self._remove(item['id'])
+                if item['is_available']:
+                    self._insert(item)
+            self.version = to_version
+            return True
+
+    def record_orders(self, item_ids):
+        """Count one more order for each item id (they need not be indexed)"""
+        with self._lock:
+            for item_id in item_ids:
+                item = self._items.get(item_id)
+                if item is not None:
+                    self._remove(item_id)
+                self._popularity[item_id] = self._popularity.get(item_id, 0) + 1
+                if item is not None:
+                    self._insert(item)
+
+    def query(self, categories=None, vegetarian=None, min_price=None, max_price=None,
+              search=None, sort='name', cursor=None, limit=20):
+        """Return (items, next_cursor) for one page of the filtered menu"""
+        if sort not in SORT_KEYS:
+            raise ValueError(f'Unknown sort key: {sort}')
+        by_price = sort in ('price-low', 'price-high')
+        descending = sort == 'price-high'
+        after = decode_cursor(cursor) if cursor else None
+        # Name cursors start with a string, price and popularity cursors with a number
+        if after is not None and (isinstance(after[0], str) == (sort != 'name')
+                                  or not isinstance(after[1], int)):
+            raise ValueError('Cursor does not match sort key')
+        search = search.lower() if search else None
+
+        with self._lock:
+            if by_price:
+                index = self._by_price
+            elif sort == 'popular':
+                index = self._by_popularity
+            else:
+                index = self._by_name
+            runs = []
+            for (category_id, is_vegetarian), entries in index.items():
+                if categories is not None and category_id not in categories:
+                    continue
+                if vegetarian is not None and is_vegetarian != vegetarian:
+                    continue
+
+                lo, hi = 0, len(entries)
+                if by_price and min_price is not None:
+                    lo = bisect.bisect_left(entries, (min_price,))
+                if by_price and max_price is not None:
+                    hi = bisect.bisect_right(entries, (max_price, float('inf')))
+                if after is not None and descending:
+                    hi = min(hi, bisect.bisect_left(entries, after))
+                elif after is not None:
+                    lo = max(lo, bisect.bisect_right(entries, after))
+
+                runs.append(_iter_range(entries, lo, hi, descending))
+
+            page = []
+            last = None
+            for entry in heapq.merge(*runs, reverse=descending):
+                item = self._items[entry[1]]
+                if min_price is not None and item['price'] < min_price:
+                    continue
+                if max_price is not None and item['price'] > max_price:
+                    continue
+                if search and search not in item['name'].lower():
+                    continue
+                if len(page) == limit:
+                    return page, encode_cursor(last)
+                page.append(item)
+                last = entry
+            return page, None
@@ -0,0 +1,221 @@
+"""
+Per-request instrumentation and Prometheus metrics.
+
+Every request records its latency, response size and the number and total
+time of the SQL statements it ran (counted with SQLAlchemy engine events on
+the request's thread), labelled by route pattern rather than URL so
+/order_details/1 and /order_details/2 share one series. Slow requests are
+logged with the SQL they issued, and slow statements on their own; every
+request is also logged as a (sampled) http.request event.
+
+Metrics live in this process only; with several worker processes, scrape
+each one.
+"""
+
+import bisect
+import logging
+import threading
+import time
+
+from flask import Response, g, has_request_context, request
+
+from structured_logging import log_event
+
+logger = logging.getLogger(__name__)
+slow_logger = logging.getLogger(__name__ + '.slow')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+# Statements kept per request for the slow-request log
+MAX_RECORDED_STATEMENTS = 50
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by label values"""
+
+    def __init__(self, name, help_text, buckets, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.label_names = label_names
+        self._series = {}  # labels -> [bucket counts..., sum, count]
+
+    def observe(self, labels, value):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+        index = bisect.bisect_left(self.buckets, value)
+        for i in range(index, len(self.buckets)):
+            series[i] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(self._series.items()):
+            label_text = format_labels(self.label_names, labels)
+            for bound, count in zip(self.buckets, series):
+                lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{label_text},le="+Inf"}} {series[-1]}')
+            lines.append(f"{self.name}_sum{{{label_text}}} {series[-2]:.6f}")
+            lines.append(f"{self.name}_count{{{label_text}}} {series[-1]}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values = {}
+
+    def inc(self, labels, amount=1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{{{format_labels(self.label_names, labels)}}} {value}")
+        return lines
+
+
+class CallbackMetric:
+    """One unlabelled value read from a function at scrape time"""
+
+    def __init__(self, name, help_text, metric_type, func):
+        self.name = name
+        self.help_text = help_text
+        self.metric_type = metric_type
+        self.func = func
+
+    def render(self):
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.metric_type}",
+                f"{self.name} {self.func()}"]
+
+
+def format_labels(names, values):
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for v in values)
+    return ','.join(f'{name}="{value}"' for name, value in zip(names, escaped))
+
+
+class RequestMetrics:
+    """Flask and SQLAlchemy hooks feeding the /metrics endpoint"""
+
+    def __init__(self, app, slow_request_ms=500, slow_query_ms=100, token=None):
+        self.slow_request = slow_request_ms / 1000
+        self.slow_query = slow_query_ms / 1000
+        self.token = token
+        self._lock = threading.Lock()
+
+        route = ('route', 'method')
+        self.requests = Counter('http_requests_total', 'Requests by route, method and status.',
+                                ('route', 'method', 'status'))
+        self.latency = Histogram('http_request_duration_seconds', 'Time to produce the response.',
+                                 LATENCY_BUCKETS, route)
+        self.statements = Histogram('db_statements_per_request', 'SQL statements run by one request.',
+                                    STATEMENT_BUCKETS, route)
+        self.sql_time = Histogram('db_time_per_request_seconds', 'Total SQL time of one request.',
+                                  LATENCY_BUCKETS, route)
+        self.response_size = Histogram('http_response_size_bytes', 'Response body size.',
+                                       SIZE_BUCKETS, route)
+        self.slow_requests = Counter('http_slow_requests_total', 'Requests slower than the slow-request threshold.',
+                                     route)
+        self.slow_queries = Counter('db_slow_statements_total', 'Statements slower than the slow-query threshold.',
+                                    route)
+        self.callbacks = []
+
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.add_url_rule('/metrics', 'metrics', self.serve)
+
+    def add_callback(self, name, help_text, metric_type, func):
+        """Export func()'s value (a 'counter' or 'gauge' kept elsewhere) on /metrics"""
+        self.callbacks.append(CallbackMetric(name, help_text, metric_type, func))
+
+    def instrument_engine(self, engine):
+        from sqlalchemy import event
+
+        event.listen(engine, 'before_cursor_execute', self._before_statement)
+        event.listen(engine, 'after_cursor_execute', self._after_statement)
+
+    def _start_request(self):
+        g.metrics_started = time.perf_counter()
+        g.metrics_statements = 0
+        g.metrics_sql_time = 0.0
+        g.metrics_sql = []
+
+    def _before_statement(self, conn, cursor, statement, parameters, context, executemany):
+        if has_request_context():
+            g.metrics_statement_started = time.perf_counter()
+
+    def _after_statement(self, conn, cursor, statement, parameters, context, executemany):
+        if not has_request_context() or 'metrics_statements' not in g:
+            return
+        elapsed = time.perf_counter() - g.pop('metrics_statement_started', time.perf_counter())
+        g.metrics_statements += 1
+        g.metrics_sql_time += elapsed
+        if len(g.metrics_sql) < MAX_RECORDED_STATEMENTS:
+            g.metrics_sql.append((elapsed, statement))
+        if elapsed >= self.slow_query:
+            with self._lock:
+                self.slow_queries.inc(self._route_labels())
+            log_event(slow_logger, 'db.slow_query', logging.WARNING,
+                      f"Slow query ({elapsed * 1000:.1f} ms) on {request.method} {request.path}",
+                      duration_ms=round(elapsed * 1000, 1), method=request.method, path=request.path,
+                      statement=' '.join(statement.split()))
+
+    @staticmethod
+    def _route_labels():
+        rule = request.url_rule.rule if request.url_rule else 'unmatched'
+        return rule, request.method
+
+    def _finish_request(self, response):
+        if 'metrics_started' not in g or request.endpoint == 'metrics':
+            return response
+        elapsed = time.perf_counter() - g.metrics_started
+        labels = self._route_labels()
+        # Streamed bodies (e.g. the SSE feed) have no size yet
+        size = None if response.is_streamed else response.calculate_content_length()
+
+        with self._lock:
+            self.requests.inc(labels + (str(response.status_code),))
+            self.latency.observe(labels, elapsed)
+            self.statements.observe(labels, g.metrics_statements)
+            self.sql_time.observe(labels, g.metrics_sql_time)
+            if size is not None:
+                self.response_size.observe(labels, size)
+            if elapsed >= self.slow_request:
+                self.slow_requests.inc(labels)
+
+        duration_ms = round(elapsed * 1000, 1)
+        # The user Flask-Login loaded for this request, if any; reading the
+        # session here would add "Vary: Cookie" to every response
+        user_id = getattr(g.get('_login_user'), 'id', None)
+        log_event(logger, 'http.request', route=labels[0], method=request.method, path=request.path,
+                  status=response.status_code, duration_ms=duration_ms,
+                  statements=g.metrics_statements, user_id=user_id)
+        if elapsed >= self.slow_request:
+            log_event(slow_logger, 'http.slow_request', logging.WARNING,
+                      f"Slow request ({duration_ms} ms, {g.metrics_statements} statements) "
+                      f"{request.method} {request.full_path.rstrip('?')}",
+                      route=labels[0], method=request.method, path=request.full_path.rstrip('?'),
+                      duration_ms=duration_ms, statements=g.metrics_statements,
+                      sql_ms=round(g.metrics_sql_time * 1000, 1),
+                      sql=[[round(duration * 1000, 1), ' '.join(sql.split())]
+                           for duration, sql in g.metrics_sql])
+        return response
+
+    def render(self):
+        with self._lock:
+            lines = []
+            for metric in (self.requests, self.latency, self.statements, self.sql_time,
+                           self.response_size, self.slow_requests, self.slow_queries, *self.callbacks):
+                lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def serve(self):
+        if self.token and request.headers.get('Authorization') != f"Bearer {self.token}":
+            return Response('Unauthorized\n', status=401, mimetype='text/plain')
+        return Response(self.render(), mimetype='text/plain; version=0.0.4')
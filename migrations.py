@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Versioned schema migrations for the Restaurant Ordering System.
+
+db.create_all() only creates missing tables; it cannot add columns or
+indexes to tables that already exist. Each migration below runs once, in
+order, inside its own transaction, and the applied versions are recorded in
+the schema_version table.
+
+Usage:
+    python migrations.py            # apply pending migrations
+    python migrations.py status     # show applied and pending migrations
+"""
+
+import sys
+from datetime import datetime
+
+from sqlalchemy import (Boolean, Column, DateTime, Float, ForeignKey, Integer, MetaData, String, Table, Text,
+                        UniqueConstraint, inspect, select)
+
+MIGRATIONS = []
+
+schema_metadata = MetaData()
+schema_version = Table(
+    'schema_version', schema_metadata,
+    Column('version', Integer, primary_key=True),
+    Column('description', String(255), nullable=False),
+    Column('applied_at', DateTime, nullable=False),
+)
+
+
+def migration(version, description):
+    """Register a migration function(db, connection) under a version number"""
+    def register(func):
+        MIGRATIONS.append((version, description, func))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return func
+    return register
+
+
+def create_indexes(db, connection, *names):
+    """Create the named indexes declared on the models, skipping existing ones"""
+    indexes = {index.name: index for table in db.metadata.sorted_tables for index in table.indexes}
+    for name in names:
+        indexes[name].create(connection, checkfirst=True)
+
+
+def add_column(connection, table_name, column):
+    """ALTER TABLE ... ADD COLUMN unless the column already exists"""
+    existing = {c['name'] for c in inspect(connection).get_columns(table_name)}
+    if column.name in existing:
+        return
+    column_type = column.type.compile(dialect=connection.dialect)
+    ddl = f'ALTER TABLE "{table_name}" ADD COLUMN {column.name} {column_type}'
+    if column.server_default is not None:
+        ddl += f' DEFAULT {column.server_default.arg}'
+    connection.exec_driver_sql(ddl)
+
+
+# The schema migration 1 creates, frozen as it was when migrations were
+# introduced. Never edit it: later columns, indexes and tables belong in new
+# migrations, which assume exactly this starting point.
+baseline_metadata = MetaData()
+
+Table('user', baseline_metadata,
+      Column('id', Integer, primary_key=True),
+      Column('name', String(100), nullable=False),
+      Column('email', String(120), nullable=False, unique=True),
+      Column('phone', String(20), nullable=False),
+      Column('address', Text, nullable=False),
+      Column('password_hash', String(255), nullable=False),
+      Column('user_type', String(20)),
+      Column('created_at', DateTime))
+
+Table('restaurant', baseline_metadata,
+      Column('id', Integer, primary_key=True),
+      Column('name', String(100), nullable=False),
+      Column('contact', String(20), nullable=False),
+      Column('location', Text, nullable=False),
+      Column('user_id', Integer, ForeignKey('user.id'), nullable=False))
+
+Table('category', baseline_metadata,
+      Column('id', Integer, primary_key=True),
+      Column('name', String(50), nullable=False),
+      Column('restaurant_id', Integer, ForeignKey('restaurant.id'), nullable=False))
+
+Table('menu_item', baseline_metadata,
+      Column('id', Integer, primary_key=True),
+      Column('name', String(100), nullable=False),
+      Column('description', Text, nullable=False),
+      Column('price', Float, nullable=False),
+      Column('image', String(255)),
+      Column('is_available', Boolean),
+      Column('is_vegetarian', Boolean),
+      Column('category_id', Integer, ForeignKey('category.id'), nullable=False),
+      Column('restaurant_id', Integer, ForeignKey('restaurant.id'), nullable=False))
+
+Table('order', baseline_metadata,
+      Column('id', Integer, primary_key=True),
+      Column('user_id', Integer, ForeignKey('user.id'), nullable=False),
+      Column('restaurant_id', Integer, ForeignKey('restaurant.id'), nullable=False),
+      Column('total_amount', Float, nullable=False),
+      Column('status', String(20)),
+      Column('delivery_address', Text, nullable=False),
+      Column('created_at', DateTime))
+
+Table('order_item', baseline_metadata,
+      Column('id', Integer, primary_key=True),
+      Column('order_id', Integer, ForeignKey('order.id'), nullable=False),
+      Column('menu_item_id', Integer, ForeignKey('menu_item.id'), nullable=False),
+      Column('quantity', Integer, nullable=False),
+      Column('price', Float, nullable=False))
+
+Table('checkout_request', baseline_metadata,
+      Column('id', Integer, primary_key=True),
+      Column('user_id', Integer, ForeignKey('user.id'), nullable=False),
+      Column('idempotency_key', String(64), nullable=False),
+      Column('order_id', Integer, ForeignKey('order.id'), nullable=False),
+      Column('created_at', DateTime),
+      UniqueConstraint('user_id', 'idempotency_key'))
+
+Table('email_outbox', baseline_metadata,
+      Column('id', Integer, primary_key=True),
+      Column('to_email', String(120), nullable=False),
+      Column('subject', String(255), nullable=False),
+      Column('body', Text, nullable=False),
+      Column('status', String(20)),
+      Column('attempts', Integer),
+      Column('next_attempt_at', DateTime),
+      Column('claimed_at', DateTime),
+      Column('claim_token', String(32)),
+      Column('last_error', Text),
+      Column('created_at', DateTime),
+      Column('sent_at', DateTime))
+
+Table('menu_version', baseline_metadata,
+      Column('id', Integer, primary_key=True),
+      Column('version', Integer, nullable=False))
+
+
+@migration(1, 'Create tables')
+def create_tables(db, connection):
+    # Tables that already exist (databases from before migrations) are kept
+    baseline_metadata.create_all(connection, checkfirst=True)
+
+
+@migration(2, 'Indexes for hot query paths')
+def add_hot_path_indexes(db, connection):
+    create_indexes(
+        db, connection,
+        'ix_restaurant_user_id',
+        'ix_category_restaurant_id',
+        'ix_menu_item_restaurant_id',
+        'ix_menu_item_category_id',
+        'ix_menu_item_is_available',
+        'ix_order_user_id_created_at',
+        'ix_order_restaurant_id_created_at',
+        'ix_order_restaurant_id_status_created_at',
+        'ix_order_status_created_at',
+        'ix_order_created_at',
+        'ix_order_item_order_id',
+        'ix_order_item_menu_item_id',
+        'ix_email_outbox_status_next_attempt_at',
+        'ix_email_outbox_claim_token',
+    )
+
+
+@migration(3, 'Resized image variants for menu items')
+def add_menu_item_image_variants(db, connection):
+    add_column(connection, 'menu_item', db.metadata.tables['menu_item'].c.image_variants)
+
+
+@migration(4, 'Order version for optimistic concurrency')
+def add_order_version(db, connection):
+    add_column(connection, 'order', db.metadata.tables['order'].c.version)
+
+
+def applied_versions(engine):
+    with engine.begin() as connection:
+        schema_metadata.create_all(connection)
+        return set(connection.execute(select(schema_version.c.version)).scalars())
+
+
+def upgrade(db):
+    """Apply every pending migration; returns the versions that were applied"""
+    engine = db.engine
+    done = applied_versions(engine)
+    applied = []
+    for version, description, func in MIGRATIONS:
+        if version in done:
+            continue
+        with engine.begin() as connection:
+            func(db, connection)
+            connection.execute(schema_version.insert().values(
+                version=version, description=description, applied_at=datetime.utcnow()))
+        print(f"Applied migration {version}: {description}")
+        applied.append(version)
+    return applied
+
+
+def status(db):
+    done = applied_versions(db.engine)
+    for version, description, _ in MIGRATIONS:
+        state = 'applied' if version in done else 'pending'
+        print(f"{version:>4}  {state:<8} {description}")
+
+
+if __name__ == '__main__':
+    from app import app, db
+
+    with app.app_context():
+        if len(sys.argv) > 1 and sys.argv[1] == 'status':
+            status(db)
+        elif not upgrade(db):
+            print("Database schema is up to date.")
@@ -0,0 +1,113 @@
+"""
+In-process pub/sub broker for live order updates.
+
+Routes publish a small JSON payload for each changed order to a channel per
+customer and per restaurant; the SSE endpoint streams those events to the
+open dashboards. Subscribers are bounded queues that hold no database state.
+
+Under a sync or threaded WSGI server every open stream occupies a worker
+thread for as long as it lasts, so the broker caps the number of subscribers
+and each stream ends after a fixed time (the browser reconnects on its own).
+Keep the cap well below the server's thread count, or run the app on an
+async worker class (gunicorn -k gevent or eventlet) where an idle stream
+costs a greenlet instead. The broker is per process: run one worker process,
+or put a shared broker in front of it before scaling out.
+"""
+
+import json
+import queue
+import threading
+import time
+
+
+class TooManySubscribers(Exception):
+    pass
+
+
+class Subscription:
+    """A bounded event queue for one connected client"""
+
+    def __init__(self, channels, maxsize=100):
+        self.channels = tuple(channels)
+        self._queue = queue.Queue(maxsize=maxsize)
+
+    def put(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            # Slow client: drop the oldest event rather than block publishers
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                pass
+            self._queue.put_nowait(event)
+
+    def get(self, timeout=None):
+        """Return the next event, or None if nothing arrived within timeout"""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class EventBroker:
+    def __init__(self, max_subscribers=None):
+        self.max_subscribers = max_subscribers
+        self._lock = threading.Lock()
+        self._channels = {}
+        self._subscriptions = set()
+
+    def subscribe(self, *channels):
+        """Return a new Subscription, raising TooManySubscribers at the cap"""
+        subscription = Subscription(channels)
+        with self._lock:
+            if self.max_subscribers is not None and len(self._subscriptions) >= self.max_subscribers:
+                raise TooManySubscribers(f"{len(self._subscriptions)} streams already open")
+            self._subscriptions.add(subscription)
+            for channel in channels:
+                self._channels.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+            for channel in subscription.channels:
+                subscribers = self._channels.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._channels[channel]
+
+    def publish(self, channel, event):
+        with self._lock:
+            subscribers = list(self._channels.get(channel, ()))
+        for subscription in subscribers:
+            subscription.put(event)
+        return len(subscribers)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscriptions)
+
+
+def sse_stream(broker, subscription, heartbeat=15, max_duration=None):
+    """Yield Server-Sent Events until the client disconnects or max_duration seconds pass"""
+    deadline = time.monotonic() + max_duration if max_duration else None
+    try:
+        yield 'retry: 5000\n\n'
+        while True:
+            timeout = heartbeat
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    # Free the worker thread; the browser reconnects after retry
+                    return
+                timeout = min(heartbeat, remaining)
+            event = subscription.get(timeout=timeout)
+            if event is None:
+                # Comment line keeps proxies from closing the idle connection
+                yield ': keepalive\n\n'
+            else:
+                yield f"event: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
+    finally:
+        broker.unsubscribe(subscription)
@@ -0,0 +1,47 @@
+"""
+Order status lifecycle.
+
+Orders move forward one step at a time:
+
+    pending -> confirmed -> preparing -> dispatched -> delivered
+
+and can be cancelled until they are dispatched. Delivered and cancelled
+orders are final. Status endpoints check every change against this table;
+the Order.version column guards against two people changing the same order
+at once.
+"""
+
+ORDER_TRANSITIONS = {
+    'pending': ('confirmed', 'cancelled'),
+    'confirmed': ('preparing', 'cancelled'),
+    'preparing': ('dispatched', 'cancelled'),
+    'dispatched': ('delivered',),
+    'delivered': (),
+    'cancelled': (),
+}
+
+ORDER_STATUSES = tuple(ORDER_TRANSITIONS)
+
+# Orders in these statuses never change again
+TERMINAL_STATUSES = tuple(status for status, targets in ORDER_TRANSITIONS.items() if not targets)
+
+
+class InvalidTransition(ValueError):
+    pass
+
+
+def can_transition(current, target):
+    return target in ORDER_TRANSITIONS.get(current, ())
+
+
+def source_statuses(target):
+    """Statuses an order may be in to move to target"""
+    return tuple(status for status, targets in ORDER_TRANSITIONS.items() if target in targets)
+
+
+def check_transition(current, target):
+    """Raise InvalidTransition unless current -> target is allowed"""
+    if target not in ORDER_TRANSITIONS:
+        raise InvalidTransition(f"Unknown status: {target}")
+    if not can_transition(current, target):
+        raise InvalidTransition(f"Cannot change an order from {current} to {target}")
@@ -0,0 +1,62 @@
+"""
+Opaque cursors and keyset pagination helpers.
+
+A cursor encodes the sort-key values of the last row on a page, so the next
+page is a range scan starting after that row instead of an OFFSET that has to
+skip every earlier row.
+"""
+
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import DateTime, and_, or_
+
+
+def encode_cursor(values):
+    values = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor, size=2):
+    """Decode an opaque cursor into a tuple of size values, raising ValueError if malformed"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError('Invalid cursor')
+    for value in values:
+        if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+            raise ValueError('Invalid cursor')
+    return tuple(values)
+
+
+def _after(columns, values, descending):
+    """Row-value comparison (a, b) > (x, y) spelled out portably"""
+    column, value = columns[0], values[0]
+    past = column < value if descending else column > value
+    if len(columns) == 1:
+        return past
+    return or_(past, and_(column == value, _after(columns[1:], values[1:], descending)))
+
+
+def keyset_page(query, columns, cursor=None, limit=20, descending=True):
+    """Return (rows, next_cursor) for query ordered by columns, resuming after cursor"""
+    if cursor:
+        values = list(decode_cursor(cursor, len(columns)))
+        for i, column in enumerate(columns):
+            if isinstance(column.type, DateTime):
+                if not isinstance(values[i], str):
+                    raise ValueError('Invalid cursor')
+                values[i] = datetime.fromisoformat(values[i])
+        query = query.filter(_after(columns, values, descending))
+
+    order = [column.desc() if descending else column.asc() for column in columns]
+    rows = query.order_by(*order).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([getattr(rows[-1], column.key) for column in columns])
+    return rows, next_cursor
@@ -0,0 +1,137 @@
+"""
+Password hashing off the request thread.
+
+Hashing and verification run on a small bounded pool so a burst of logins
+cannot occupy every WSGI worker with key stretching; when the pool's queue is
+full callers get PasswordHasherBusy straight away instead of piling up.
+bcrypt and hashlib release the GIL, so the default thread pool hashes in
+parallel; a process pool can be selected for schemes that do not.
+
+Each stored hash carries its own scheme and parameters (bcrypt cost, PBKDF2
+iterations, scrypt n/r/p), so old hashes keep verifying after the configured
+scheme changes and needs_rehash() tells the caller when to upgrade one.
+"""
+
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import bcrypt
+from werkzeug.security import check_password_hash, generate_password_hash
+
+SCHEMES = ('bcrypt', 'pbkdf2', 'scrypt')
+
+DEFAULT_PARAMS = {
+    'bcrypt': {'rounds': 12},
+    'pbkdf2': {'hash_name': 'sha256', 'iterations': 600000},
+    'scrypt': {'n': 32768, 'r': 8, 'p': 1},
+}
+
+
+class PasswordHasherBusy(Exception):
+    """Too many hash/verify calls are already queued"""
+
+
+def identify(stored):
+    """Scheme name of a stored hash, or None if it is not one we know"""
+    if stored.startswith(('$2a$', '$2b$', '$2y$')):
+        return 'bcrypt'
+    scheme = stored.split('$', 1)[0].split(':', 1)[0]
+    return scheme if scheme in SCHEMES else None
+
+
+def hash_params(stored):
+    """Parameters a stored hash was made with, in the same shape as DEFAULT_PARAMS"""
+    scheme = identify(stored)
+    if scheme == 'bcrypt':
+        return {'rounds': int(stored.split('$')[2])}
+    method = stored.split('$', 1)[0].split(':')
+    if scheme == 'pbkdf2':
+        return {'hash_name': method[1], 'iterations': int(method[2])}
+    if scheme == 'scrypt':
+        return {'n': int(method[1]), 'r': int(method[2]), 'p': int(method[3])}
+    return None
+
+
+def hash_password(password, scheme, params):
+    if scheme == 'bcrypt':
+        # bcrypt only reads the first 72 bytes of the password
+        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(params['rounds'])).decode('ascii')
+    if scheme == 'pbkdf2':
+        return generate_password_hash(password, method=f"pbkdf2:{params['hash_name']}:{params['iterations']}")
+    if scheme == 'scrypt':
+        return generate_password_hash(password, method=f"scrypt:{params['n']}:{params['r']}:{params['p']}")
+    raise ValueError(f"Unknown password scheme: {scheme}")
+
+
+def verify_password(password, stored):
+    scheme = identify(stored)
+    if scheme == 'bcrypt':
+        return bcrypt.checkpw(password.encode('utf-8'), stored.encode('ascii'))
+    if scheme in ('pbkdf2', 'scrypt'):
+        return check_password_hash(stored, password)
+    return False
+
+
+class PasswordHasher:
+    """Hashes new passwords with one configured scheme and verifies any known one"""
+
+    def __init__(self, scheme='bcrypt', params=None, workers=2, max_pending=64, executor='thread'):
+        if scheme not in SCHEMES:
+            raise ValueError(f"Unknown password scheme: {scheme}")
+        self.scheme = scheme
+        self.params = {**DEFAULT_PARAMS[scheme], **(params or {})}
+        self.workers = workers
+        self.executor_type = executor
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+        self._executor = None
+        self._lock = threading.Lock()
+        self._dummy_hash = None
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                if self.executor_type == 'process':
+                    # Spawned, not forked: forking a threaded server can deadlock the child
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                         mp_context=multiprocessing.get_context('spawn'))
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+    def _run(self, func, *args):
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHasherBusy()
+        try:
+            future = self._pool().submit(func, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result()
+
+    def hash(self, password):
+        return self._run(hash_password, password, self.scheme, self.params)
+
+    def verify(self, password, stored):
+        """Check password against stored; pass stored=None for an unknown user
+
+        Unknown users are checked against a throwaway hash so the response
+        time does not reveal which emails are registered.
+        """
+        if stored is None:
+            if self._dummy_hash is None:
+                self._dummy_hash = self.hash('dummy password')
+            self._run(verify_password, password, self._dummy_hash)
+            return False
+        return self._run(verify_password, password, stored)
+
+    def needs_rehash(self, stored):
+        """True if stored was made with another scheme or other parameters"""
+        return identify(stored) != self.scheme or hash_params(stored) != self.params
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
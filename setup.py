@@ -70,9 +70,10 @@ def check_database():
     print("🗄️  Checking database connection...")
     try:
         from app import app, db
+        from migrations import upgrade
         with app.app_context():
-            db.create_all()
-            print("✅ Database tables created successfully")
+            upgrade(db)
+            print("✅ Database schema is up to date")
     except Exception as e:
         print(f"❌ Database error: {e}")
         print("⚠️  Please make sure MySQL is running and configured correctly")
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Content-hashed, precompressed static assets.
+
+The files under static/css and static/js are copied to static/dist with a
+hash of their content in the name (css/custom.css -> css/custom.1a2b3c4d5e6f.css)
+plus .gz and, when the brotli package is installed, .br siblings. Because a
+hashed URL changes whenever the content does, /assets/ responses can be cached
+for a year as immutable.
+
+The build is a deploy step. The app only reads the manifest when it starts,
+and asset_url() falls back to the plain /static/ URL for anything missing
+from it (or when no build has been run).
+
+Usage:
+    python static_assets.py          # rebuild static/dist and its manifest
+    flask --app app build-assets     # the same, through the app's CLI
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+
+from flask import request, send_from_directory, url_for
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always produced
+    brotli = None
+
+ASSET_DIRS = ('css', 'js')
+DIST_DIR = 'dist'
+MANIFEST = 'manifest.json'
+HASH_LENGTH = 12
+CACHE_SECONDS = 365 * 24 * 60 * 60
+
+# Preferred first; each entry is (Content-Encoding, file suffix)
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+logger = logging.getLogger(__name__)
+
+
+def _write_atomic(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _compress(data, encoding):
+    if encoding == 'gzip':
+        # mtime=0 keeps the output identical across builds
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    if encoding == 'br' and brotli is not None:
+        return brotli.compress(data, quality=11)
+    return None
+
+
+def build_assets(static_folder):
+    """Fingerprint and precompress every asset; returns the {name: hashed name} manifest"""
+    dist = os.path.join(static_folder, DIST_DIR)
+    manifest = {}
+
+    for asset_dir in ASSET_DIRS:
+        for root, _, files in os.walk(os.path.join(static_folder, asset_dir)):
+            for filename in sorted(files):
+                source = os.path.join(root, filename)
+                name = os.path.relpath(source, static_folder).replace(os.sep, '/')
+                with open(source, 'rb') as f:
+                    data = f.read()
+
+                digest = hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+                stem, extension = os.path.splitext(name)
+                hashed = f"{stem}.{digest}{extension}"
+                manifest[name] = hashed
+
+                # Same name means same content, so existing files are left alone
+                target = os.path.join(dist, hashed)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                for encoding, suffix in ENCODINGS:
+                    if os.path.exists(target + suffix):
+                        continue
+                    compressed = _compress(data, encoding)
+                    # Only keep encodings that actually save bytes
+                    if compressed is not None and len(compressed) < len(data):
+                        _write_atomic(target + suffix, compressed)
+                if not os.path.exists(target):
+                    _write_atomic(target, data)
+
+    os.makedirs(dist, exist_ok=True)
+    _write_atomic(os.path.join(dist, MANIFEST), json.dumps(manifest, indent=2, sort_keys=True).encode())
+    return manifest
+
+
+def load_manifest(static_folder):
+    """The manifest written by the last build_assets(), or {} if there is none"""
+    try:
+        with open(os.path.join(static_folder, DIST_DIR, MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def print_build(manifest):
+    for name, hashed in sorted(manifest.items()):
+        print(f"✓ {name} -> {DIST_DIR}/{hashed}")
+    if brotli is None:
+        print("brotli is not installed; only gzip copies were written")
+
+
+class StaticAssets:
+    """Serves the built assets from /assets/ and adds asset_url() to templates"""
+
+    def __init__(self, app, endpoint='hashed_asset'):
+        self.app = app
+        self.endpoint = endpoint
+        self.dist = os.path.join(app.static_folder, DIST_DIR)
+        self.manifest = load_manifest(app.static_folder)
+        if not self.manifest:
+            logger.info("No static asset build found; serving unhashed /static/ URLs "
+                        "(run python static_assets.py)", extra={'event': 'assets.not_built'})
+
+        app.add_url_rule('/assets/<path:filename>', endpoint, self.serve)
+        app.add_template_global(self.asset_url, 'asset_url')
+        app.cli.command('build-assets')(self.build_command)
+
+    def build_command(self):
+        """Fingerprint and precompress static/css and static/js into static/dist."""
+        self.manifest = build_assets(self.app.static_folder)
+        print_build(self.manifest)
+
+    def asset_url(self, filename, **values):
+        """Drop-in for url_for('static', filename=...) that returns the hashed URL"""
+        hashed = self.manifest.get(filename)
+        if hashed is None:
+            return url_for('static', filename=filename, **values)
+        return url_for(self.endpoint, filename=hashed, **values)
+
+    def serve(self, filename):
+        # The type of the uncompressed file, not application/gzip
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+        served, content_encoding = filename, None
+        for encoding, suffix in ENCODINGS:
+            path = safe_join(self.dist, filename + suffix)
+            if request.accept_encodings[encoding] and path and os.path.isfile(path):
+                served, content_encoding = filename + suffix, encoding
+                break
+
+        response = send_from_directory(self.dist, served, mimetype=mimetype, max_age=CACHE_SECONDS)
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        response.vary.add('Accept-Encoding')
+        if content_encoding:
+            response.content_encoding = content_encoding
+        return response
+
+
+if __name__ == '__main__':
+    static_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+    print_build(build_assets(static_folder))
@@ -0,0 +1,168 @@
+"""
+JSON-lines logging that never blocks the caller.
+
+Loggers hand records to a bounded in-memory queue, and one background
+QueueListener thread formats them and writes them to stdout or a file. When
+the output stalls (a full pipe under the process manager, a slow disk), the
+listener waits and the queue fills. After that, new records are dropped and
+counted rather than holding up request threads. The count is exported on
+/metrics and logged when the listener stops.
+
+Events are ordinary log records with an 'event' name and extra fields:
+
+    log_event(logger, 'order.status_changed', order_id=7, user_id=3,
+              restaurant_id=1, status='preparing')
+
+writes one line like
+
+    {"ts": "...", "level": "INFO", "logger": "app", "event": "order.status_changed",
+     "message": "order.status_changed", "order_id": 7, "user_id": 3, ...}
+
+High-volume events can be sampled per event name. Sampling happens before a
+record is queued. A kept record carries its sample_rate, so counts can be
+scaled back up.
+"""
+
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import threading
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+# Attributes every LogRecord has; anything else on a record came from extra=
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+def log_event(logger, event, level=logging.INFO, message=None, **fields):
+    """Log a named event with structured fields"""
+    if logger.isEnabledFor(level):
+        logger.log(level, message or event, extra={'event': event, **fields})
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: timestamp, level, logger, event, message and extra fields"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'event': getattr(record, 'event', None),
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and key not in entry:
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class EventSampler(logging.Filter):
+    """Keep each record of a sampled event with probability rates[event]"""
+
+    def __init__(self, rates, rng=random.random):
+        super().__init__()
+        self.rates = dict(rates or {})
+        self._rng = rng
+
+    def filter(self, record):
+        rate = self.rates.get(getattr(record, 'event', None))
+        if rate is None or rate >= 1:
+            return True
+        if rate <= 0 or self._rng() >= rate:
+            return False
+        record.sample_rate = rate
+        return True
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of blocking or erroring on a full queue"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+
+    def prepare(self, record):
+        # Resolve the message and traceback on the caller's thread; the
+        # listener only sees plain values
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+
+
+class StructuredLogging:
+    """Route the root logger through a bounded queue to a JSON-lines writer thread"""
+
+    def __init__(self, level='INFO', log_file=None, sample_rates=None, queue_size=10000,
+                 slow_log_file=None):
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.handler = NonBlockingQueueHandler(self.queue)
+        self.handler.addFilter(EventSampler(sample_rates))
+
+        formatter = JsonFormatter()
+        output = logging.FileHandler(log_file) if log_file else logging.StreamHandler(sys.stdout)
+        output.setFormatter(formatter)
+        handlers = [output]
+        if slow_log_file:
+            # Slow-request and slow-query records are also kept in their own file
+            slow = logging.FileHandler(slow_log_file)
+            slow.setFormatter(formatter)
+            slow.addFilter(logging.Filter('metrics.slow'))
+            handlers.append(slow)
+        self.listener = logging.handlers.QueueListener(self.queue, *handlers, respect_handler_level=True)
+
+        root = logging.getLogger()
+        for existing in list(root.handlers):
+            if isinstance(existing, NonBlockingQueueHandler):
+                root.removeHandler(existing)
+        root.addHandler(self.handler)
+        root.setLevel(level)
+        self._lock = threading.Lock()
+        self.listener.start()
+        self._running = True
+        atexit.register(self.stop)
+
+    @property
+    def dropped(self):
+        """Records dropped so far because the queue was full"""
+        return self.handler.dropped
+
+    def stop(self):
+        """Flush queued records, stop the writer thread and report any drops"""
+        with self._lock:
+            if not self._running:
+                return
+            self._running = False
+            # Detach first so nothing is queued behind the listener's sentinel
+            logging.getLogger().removeHandler(self.handler)
+            self.listener.stop()
+        if self.dropped:
+            # Written straight to the outputs; the queue has no reader now
+            record = logger.makeRecord(
+                logger.name, logging.WARNING, __file__, 0,
+                f"{self.dropped} log records were dropped because the log queue was full", (), None,
+                extra={'event': 'logging.dropped', 'dropped': self.dropped})
+            for handler in self.listener.handlers:
+                handler.handle(record)
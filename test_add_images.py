@@ -0,0 +1,142 @@
+"""
+Tests for the add_images.py pipeline against a local HTTP stand-in.
+
+Fixture images are served by http.server on an ephemeral port and the
+Unsplash URLs are pointed at it with mirror=, so no network is needed.
+Run with: python -m pytest test_add_images.py
+"""
+
+import http.server
+import io
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from PIL import Image
+
+from add_images import FOOD_IMAGES, build_images, plan_images, url_key
+
+URLS = [
+    'https://images.unsplash.com/photo-a?w=400&h=300&fit=crop',
+    'https://images.unsplash.com/photo-b?w=400&h=300&fit=crop',
+    'https://images.unsplash.com/photo-c?w=400&h=300&fit=crop',
+    'https://images.unsplash.com/photo-d?w=400&h=300&fit=crop',
+]
+
+
+class FixtureHandler(http.server.BaseHTTPRequestHandler):
+    """Serves self.server.files by path, slowly, counting requests and overlap"""
+
+    def do_GET(self):
+        server = self.server
+        path = self.path.split('?')[0]
+        with server.lock:
+            server.requests.append(path)
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            time.sleep(server.delay)
+            body = server.files.get(path)
+            if body is None:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'image/jpeg')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+def jpeg(width=800, height=600, color='tomato'):
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), color).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def stand_in():
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), FixtureHandler)
+    server.files = {f"/{name}": jpeg() for name in ('photo-a', 'photo-b', 'photo-c', 'photo-d')}
+    server.requests, server.in_flight, server.max_in_flight = [], 0, 0
+    server.lock = threading.Lock()
+    server.delay = 0.2
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server, f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def build(tmp_path, mirror, urls=URLS, workers=4):
+    return build_images(urls, str(tmp_path / 'uploads'), str(tmp_path / 'cache'),
+                        workers=workers, processes=1, mirror=mirror)
+
+
+def test_downloads_run_concurrently_and_are_resized(tmp_path, stand_in):
+    server, mirror = stand_in
+
+    paths, failures = build(tmp_path, mirror)
+
+    assert failures == {}
+    assert set(paths) == set(URLS)
+    assert server.max_in_flight > 1
+    for url, path in paths.items():
+        assert path == f"uploads/sample_{url_key(url)[:16]}.jpg"
+        with Image.open(tmp_path / path) as img:
+            assert (img.format, img.size) == ('JPEG', (400, 300))
+
+
+def test_second_run_is_served_from_the_cache(tmp_path, stand_in, capsys):
+    server, mirror = stand_in
+    build(tmp_path, mirror)
+    assert len(server.requests) == len(URLS)
+
+    paths, failures = build(tmp_path, mirror)
+
+    assert failures == {} and set(paths) == set(URLS)
+    assert len(server.requests) == len(URLS)
+    assert f"{len(URLS)} from the download cache" in capsys.readouterr().out
+
+
+def test_each_distinct_url_is_downloaded_once(tmp_path, stand_in):
+    server, mirror = stand_in
+    items = [SimpleNamespace(id=i, name=name, image=None)
+             for i, name in enumerate(['Margherita', 'Pepperoni', 'BBQ Pizza', 'Hawaiian',
+                                       'Four Cheese', 'Veggie', 'Calzone'], 1)]
+    items.append(SimpleNamespace(id=99, name='Has one', image='uploads/existing.jpg'))
+
+    plan = plan_images(items)
+
+    # Seven pizzas over five pizza URLs, two of them repeated in FOOD_IMAGES
+    assert set(plan) <= set(FOOD_IMAGES['pizza'])
+    assert len(plan) == len(set(FOOD_IMAGES['pizza'])) == 3
+    assert sorted(item_id for entries in plan.values() for item_id, _ in entries) == list(range(1, 8))
+    for url in plan:
+        server.files[url.split('?')[0].replace('https://images.unsplash.com', '')] = jpeg()
+
+    paths, failures = build(tmp_path, mirror, urls=list(plan))
+
+    assert failures == {} and set(paths) == set(plan)
+    assert sorted(server.requests) == sorted({url.split('?')[0][len('https://images.unsplash.com'):]
+                                              for url in plan})
+
+
+def test_failures_are_reported_without_stopping_the_run(tmp_path, stand_in):
+    server, mirror = stand_in
+    server.files['/photo-b'] = b'not an image'
+    del server.files['/photo-c']
+
+    paths, failures = build(tmp_path, mirror)
+
+    assert set(paths) == {URLS[0], URLS[3]}
+    assert failures == {URLS[1]: 'Not a valid image', URLS[2]: 'Could not download the image'}
+    # Failed downloads leave nothing in the cache, so the next run retries them
+    assert sorted(os.listdir(tmp_path / 'cache')) == sorted(url_key(url) for url in (URLS[0], URLS[3]))
@@ -0,0 +1,166 @@
+"""
+Tests for the email outbox workers against an in-process SMTP stand-in.
+
+smtplib.SMTP is replaced by FakeSMTP, which records what would have been
+sent and can be told to refuse messages. Run with: python -m pytest test_email_outbox.py
+"""
+
+import smtplib
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+
+import email_outbox
+from email_outbox import OutboxWorkerPool
+
+
+class FakeSMTP:
+    """Stands in for smtplib.SMTP; shared class state records every session"""
+
+    sessions = []
+    sent = []
+    refused = set()  # recipients whose mail is rejected
+
+    def __init__(self, host, port, timeout=None):
+        self.host, self.port = host, port
+        self.logged_in = None
+        FakeSMTP.sessions.append(self)
+
+    def starttls(self):
+        pass
+
+    def login(self, username, password):
+        self.logged_in = username
+
+    def sendmail(self, sender, to_email, message):
+        if to_email in FakeSMTP.refused:
+            raise smtplib.SMTPRecipientsRefused({to_email: (550, b'mailbox unavailable')})
+        FakeSMTP.sent.append((sender, to_email, message))
+
+    def quit(self):
+        pass
+
+
+@pytest.fixture
+def outbox(tmp_path, monkeypatch):
+    monkeypatch.setattr(email_outbox.smtplib, 'SMTP', FakeSMTP)
+    FakeSMTP.sessions, FakeSMTP.sent, FakeSMTP.refused = [], [], set()
+
+    app = Flask(__name__)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'outbox.db'}",
+        MAIL_SERVER='smtp.test', MAIL_PORT=587, MAIL_USE_TLS=True,
+        MAIL_USERNAME='shop@example.com', MAIL_PASSWORD='secret',
+        MAIL_DEFAULT_SENDER='shop@example.com')
+    db = SQLAlchemy(app)
+
+    class EmailOutbox(db.Model):
+        id = db.Column(db.Integer, primary_key=True)
+        to_email = db.Column(db.String(120), nullable=False)
+        subject = db.Column(db.String(255), nullable=False)
+        body = db.Column(db.Text, nullable=False)
+        status = db.Column(db.String(20), default='pending')
+        attempts = db.Column(db.Integer, default=0)
+        next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow)
+        claimed_at = db.Column(db.DateTime)
+        claim_token = db.Column(db.String(32))
+        last_error = db.Column(db.Text)
+        created_at = db.Column(db.DateTime, default=datetime.utcnow)
+        sent_at = db.Column(db.DateTime)
+
+    with app.app_context():
+        db.create_all()
+
+    pool = OutboxWorkerPool(app, db, EmailOutbox, workers=2, batch_size=2, max_attempts=3,
+                            backoff_base=30, poll_interval=0.05)
+
+    def queue(*addresses):
+        with app.app_context():
+            db.session.add_all(EmailOutbox(to_email=address, subject='Order Confirmation',
+                                           body='Your order has been placed!') for address in addresses)
+            db.session.commit()
+
+    def rows():
+        with app.app_context():
+            return {row.to_email: row for row in EmailOutbox.query.order_by(EmailOutbox.id)}
+
+    def make_due():
+        with app.app_context():
+            db.session.execute(db.update(EmailOutbox).values(
+                next_attempt_at=datetime.utcnow() - timedelta(seconds=1)))
+            db.session.commit()
+
+    yield pool, queue, rows, make_due
+    pool.stop()
+
+
+def test_drain_sends_every_due_row_over_one_connection(outbox):
+    pool, queue, rows, _ = outbox
+    queue('a@example.com', 'b@example.com', 'c@example.com')
+
+    assert pool.drain() == 3
+
+    assert [to for _, to, _ in FakeSMTP.sent] == ['a@example.com', 'b@example.com', 'c@example.com']
+    assert len(FakeSMTP.sessions) == 1
+    assert FakeSMTP.sessions[0].logged_in == 'shop@example.com'
+    assert 'Subject: Order Confirmation' in FakeSMTP.sent[0][2]
+    assert {row.status for row in rows().values()} == {'sent'}
+    assert pool.drain() == 0
+
+
+def test_failed_send_is_retried_after_backoff(outbox):
+    pool, queue, rows, make_due = outbox
+    queue('a@example.com')
+    FakeSMTP.refused = {'a@example.com'}
+
+    before = datetime.utcnow()
+    pool.drain()
+    row = rows()['a@example.com']
+    assert (row.status, row.attempts) == ('pending', 1)
+    assert 'mailbox unavailable' in row.last_error
+    assert row.next_attempt_at >= before + timedelta(seconds=30)
+
+    # Not due yet, so nothing is sent
+    assert pool.drain() == 0
+    assert pool.backoff(2) == timedelta(seconds=60)
+
+    FakeSMTP.refused = set()
+    make_due()
+    assert pool.drain() == 1
+    row = rows()['a@example.com']
+    assert (row.status, row.attempts) == ('sent', 1)
+    assert len(FakeSMTP.sent) == 1
+
+
+def test_row_is_dead_lettered_after_max_attempts(outbox):
+    pool, queue, rows, make_due = outbox
+    queue('a@example.com', 'b@example.com')
+    FakeSMTP.refused = {'a@example.com'}
+
+    for _ in range(3):
+        pool.drain()
+        make_due()
+
+    statuses = {to: (row.status, row.attempts) for to, row in rows().items()}
+    assert statuses == {'a@example.com': ('dead', 3), 'b@example.com': ('sent', 0)}
+    assert pool.drain() == 0
+
+
+def test_started_workers_deliver_rows_and_start_once_per_process(outbox):
+    pool, queue, rows, _ = outbox
+    pool.start()
+    pool.start()
+    assert len(pool._threads) == 2 and pool.running
+
+    queue('a@example.com')
+    pool.wake()
+    deadline = time.monotonic() + 5
+    while rows()['a@example.com'].status != 'sent' and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert rows()['a@example.com'].status == 'sent'
+
+    pool.stop()
+    assert not pool.running